@@ -24,4 +24,7 @@ class FileTransferError(Exception):
     pass
 
 class DiffError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class SnapshotError(Exception):
+    pass
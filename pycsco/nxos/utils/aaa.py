@@ -1,6 +1,9 @@
 try:
     import xmltodict
     import re
+    from pycsco.nxos.error import CLIError
+    from pycsco.nxos.utils.nxapi_lib import get_command_bodies, \
+        cmd_list_to_string
 except ImportError as e:
     print '*' * 30
     print e
@@ -8,7 +11,17 @@ except ImportError as e:
 
 __all__ = ['get_aaa_server_info', 'config_aaa_server',
            'default_aaa_server', 'get_aaa_host_info',
-           'config_aaa_host']
+           'config_aaa_host', 'AaaState', 'get_aaa_state',
+           'config_aaa_hosts', 'config_aaa_hosts_string']
+
+SERVER_TYPES = ['radius', 'tacacs']
+
+HOST_PATTERN = \
+    '(acct-port \d+)|(timeout \d+)|(auth-port \d+)|(key 7 "\w+")|( port \d+)'
+
+HOST_KEY_MAP = {'acct-port': 'acct_port',
+                'auth-port': 'auth_port',
+                'port': 'tacacs_port'}
 
 
 def _match_dict(match_list, key_map):
@@ -65,28 +78,46 @@ def remove_aaa_server_global_key(server_type):
     return 'no {0}-server key'.format(server_type)
 
 
-def get_aaa_server_info(device, server_type):
+def _server_info_from_text(server_text, directed_request_text):
     aaa_server_info = {}
 
-    response = device.show(
-        'show {0}-server'.format(server_type), text=True)
-    response_dict = xmltodict.parse(response[1])
-    response_text = response_dict['ins_api']['outputs']['output']['body']
-    response_lines = response_text.split('\n')
-
-    for line in response_lines:
+    for line in (server_text or '').split('\n'):
         if line.startswith('timeout'):
             aaa_server_info['timeout'] = line.split(':')[1]
         elif line.startswith('deadtime'):
             aaa_server_info['deadtime'] = line.split(':')[1]
 
+    aaa_server_info['directed_request'] = directed_request_text
+
+    return aaa_server_info
+
+
+def get_aaa_server_info(device, server_type, state=None):
+    '''Returns a dictionary of the global settings of a AAA server type.
+
+    Args:
+        device (Device): NX-API enabled device from which to retrieve configration
+        server_type (string): "radius" or "tacacs"
+        state (AaaState): output of get_aaa_state to use instead of
+            querying the device, optional
+
+    Returns:
+        A dictionary of the global settings.
+    '''
+    if state is not None:
+        return dict(state.servers.get(server_type, {}))
+
+    response = device.show(
+        'show {0}-server'.format(server_type), text=True)
+    response_dict = xmltodict.parse(response[1])
+    server_text = response_dict['ins_api']['outputs']['output']['body']
+
     response = device.show(
         'show {0}-server directed-request'.format(server_type), text=True)
     response_dict = xmltodict.parse(response[1])
     response_text = response_dict['ins_api']['outputs']['output']['body']
-    aaa_server_info['directed_request'] = response_text
 
-    return aaa_server_info
+    return _server_info_from_text(server_text, response_text)
 
 
 def config_aaa_server(params, server_type):
@@ -152,17 +183,27 @@ def default_aaa_server(params, server_type):
     return cmds
 
 
-def get_aaa_host_info(device, server_type, address):
+def _host_info_from_text(response_text):
+    raw_match = re.findall(HOST_PATTERN, response_text)
+    return _match_dict(raw_match, HOST_KEY_MAP)
+
+
+def get_aaa_host_info(device, server_type, address, state=None):
     '''Returns a dictionary of configured parameters for a given AAA host.
 
     Args:
         device (Device): NX-API enabled device from which to retrieve configration
         server_type (bool): "radius" or "tacacs"
         address (string): IP address or network name that identifies the AAA host
+        state (AaaState): output of get_aaa_state to use instead of
+            querying the device, optional
 
     Returns:
         A dictionary of configured parameters for the given AAA host.
     '''
+    if state is not None:
+        return dict(state.hosts.get((server_type, address), {}))
+
     aaa_host_info = {}
 
     response = device.show(
@@ -174,14 +215,7 @@ def get_aaa_host_info(device, server_type, address):
     if not response_text:
         return {}
 
-    pattern =\
-        '(acct-port \d+)|(timeout \d+)|(auth-port \d+)|(key 7 "\w+")|( port \d+)'
-    raw_match = re.findall(pattern, response_text)
-    aaa_host_info =\
-        _match_dict(
-            raw_match, {'acct-port': 'acct_port',
-                        'auth-port': 'auth_port',
-                        'port': 'tacacs_port'})
+    aaa_host_info = _host_info_from_text(response_text)
 
     return aaa_host_info
 
@@ -226,3 +260,104 @@ def config_aaa_host(server_type, address, params, clear=False):
     cmds.append(cmd_str)
 
     return cmds
+
+
+def config_aaa_hosts(server_type, hosts, clear=False):
+    '''Returns a list of commands for the host-specific AAA settings of
+    many hosts.
+
+    Args:
+        server_type (string): "radius" or "tacacs"
+        hosts (dictionary): address -> dictionary of parameters, see
+            config_aaa_host
+        clear (bool): Whether the configuration should be cleared first
+
+    Returns:
+        A list of commands (strings), the hosts in address order.
+    '''
+    cmds = []
+    for address, params in sorted(hosts.iteritems()):
+        cmds.extend(config_aaa_host(server_type, address, params, clear))
+    return cmds
+
+
+def config_aaa_hosts_string(server_type, hosts, clear=False):
+    '''Returns the commands of config_aaa_hosts as one string, ready to
+    be sent with a single device.config() call.
+    '''
+    return cmd_list_to_string(config_aaa_hosts(server_type, hosts, clear))
+
+
+def _aaa_commands(server_type):
+    return ['show {0}-server'.format(server_type),
+            'show {0}-server directed-request'.format(server_type)]
+
+
+class AaaState(object):
+    '''The global and per-host RADIUS and TACACS+ settings of a device.
+    get_aaa_server_info and get_aaa_host_info accept one as ``state``
+    instead of querying the device themselves.
+
+    Args:
+        server_texts (dictionary): server type -> text of
+            'show <type>-server' and 'show <type>-server directed-request',
+            None for a type that couldn't be read
+        host_text (string): running-config lines of the AAA hosts
+    '''
+    def __init__(self, server_texts, host_text):
+        # server type -> dictionary as returned by get_aaa_server_info
+        self.servers = {}
+        for server_type, texts in server_texts.iteritems():
+            if texts is not None:
+                self.servers[server_type] = _server_info_from_text(*texts)
+
+        # (server type, address) -> dictionary as returned by
+        # get_aaa_host_info
+        self.hosts = {}
+        lines = {}
+        for line in (host_text or '').split('\n'):
+            words = line.split()
+            if len(words) < 3 or words[1] != 'host' or \
+                    not words[0].endswith('-server'):
+                continue
+            key = (str(words[0][:-len('-server')]), str(words[2]))
+            lines.setdefault(key, []).append(line)
+        for key, host_lines in lines.iteritems():
+            self.hosts[key] = _host_info_from_text('\n'.join(host_lines))
+
+
+def get_aaa_state(device, server_types=SERVER_TYPES):
+    '''Returns the AAA settings of a device from a single request.
+
+    The server settings of a type whose commands are rejected (e.g.
+    tacacs+ isn't enabled) are left out.  That costs one retry per type.
+
+    Args:
+        device (Device): NX-API enabled device from which to retrieve configration
+        server_types (list): "radius" and/or "tacacs"
+
+    Returns:
+        An AaaState
+    '''
+    commands = []
+    for server_type in server_types:
+        commands.extend(_aaa_commands(server_type))
+    host_command = 'show running-config | include "server host"'
+
+    server_texts = {}
+    try:
+        bodies = get_command_bodies(device, commands + [host_command],
+                                    text=True)
+        host_text = bodies.pop()
+        for server_type in server_types:
+            server_texts[server_type] = (bodies.pop(0), bodies.pop(0))
+    except CLIError:
+        host_text = get_command_bodies(device, [host_command], text=True)[0]
+        for server_type in server_types:
+            try:
+                server_texts[server_type] = tuple(get_command_bodies(
+                    device, _aaa_commands(server_type), text=True))
+            except CLIError:
+                server_texts[server_type] = None
+
+    return AaaState(server_texts, host_text)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Jason Edelman <jedelman8@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""IPv4 addressing of a group of devices, indexed by address and by
+prefix for IP plan audits.
+"""
+try:
+    import socket
+    import struct
+    from pycsco.nxos.utils import parallel
+    from pycsco.nxos.utils.nxapi_lib import get_ipv4_index, \
+        _normalize_interface
+except ImportError as e:
+    print '*' * 30
+    print e
+    print '*' * 30
+
+__all__ = ['AddressIndex']
+
+
+def _to_int(address):
+    try:
+        return struct.unpack('>I', socket.inet_aton(address))[0]
+    except (socket.error, TypeError):
+        return None
+
+
+def _network(address, masklen):
+    value = _to_int(address)
+    if value is None:
+        return None
+    mask = (0xffffffff << (32 - masklen)) & 0xffffffff
+    return value & mask
+
+
+def _split(prefix):
+    address, _, masklen = str(prefix).partition('/')
+    try:
+        masklen = int(masklen) if masklen else 32
+    except ValueError:
+        return None, None
+    if not 0 <= masklen <= 32:
+        return None, None
+    return address, masklen
+
+
+class AddressIndex(object):
+    """Primary and secondary IPv4 addresses of a group of devices.
+
+    Addresses are indexed as they are configured and by the network
+    they are in, so ``find`` and ``containing`` are a few dict lookups
+    whatever the number of devices and interfaces.
+
+    Args:
+        workers (int): OPTIONAL - number of devices polled at once
+    """
+    def __init__(self, workers=parallel.DEFAULT_WORKERS):
+        self.workers = workers
+        # device ip -> output of get_ipv4_index
+        self.interfaces = {}
+        # address -> set of (device ip, interface)
+        self.addresses = {}
+        # (network as int, masklen) -> set of (device ip, interface)
+        self.networks = {}
+        self.masklens = set()
+        self.errors = {}
+
+    @staticmethod
+    def _prefixes(entry):
+        prefixes = []
+        if entry['ip_addr'] != 'None':
+            prefixes.append('{0}/{1}'.format(entry['ip_addr'], entry['mask']))
+        prefixes.extend(entry['secondary'])
+        return prefixes
+
+    def _remove(self, ip):
+        for name, entry in self.interfaces.pop(ip, {}).iteritems():
+            for prefix in self._prefixes(entry):
+                address, masklen = _split(prefix)
+                for index, key in ((self.addresses, address),
+                                   (self.networks, (
+                                       _network(address, masklen), masklen))):
+                    owners = index.get(key)
+                    if owners is not None:
+                        owners.discard((ip, name))
+                        if not owners:
+                            del index[key]
+
+    def _add(self, ip, interfaces):
+        self.interfaces[ip] = interfaces
+        for name, entry in interfaces.iteritems():
+            for prefix in self._prefixes(entry):
+                address, masklen = _split(prefix)
+                network = _network(address, masklen)
+                if network is None:
+                    continue
+                self.addresses.setdefault(address, set()).add((ip, name))
+                self.networks.setdefault(
+                    (network, masklen), set()).add((ip, name))
+                self.masklens.add(masklen)
+
+    def refresh(self, devices):
+        """Poll the devices and update the index.
+
+        Args:
+            devices (list): Device objects of NX-API enabled devices
+
+        Returns:
+            list: ips of the devices that were polled.  Devices that
+            couldn't be polled are left as they were and recorded in
+            ``errors`` keyed by ip.
+        """
+        polled = []
+        for device, result, error in parallel.iter_results(
+                get_ipv4_index, devices, self.workers):
+            if error is not None:
+                self.errors[device.ip] = error
+                continue
+            self.errors.pop(device.ip, None)
+            self._remove(device.ip)
+            self._add(device.ip, result)
+            polled.append(device.ip)
+        return polled
+
+    def forget(self, device):
+        """Drop a device from the index.
+        """
+        self._remove(device.ip)
+
+    def find(self, address):
+        """Interfaces an address is configured on.
+
+        Returns:
+            list: sorted (device ip, interface) tuples
+        """
+        return sorted(self.addresses.get(_split(address)[0], ()))
+
+    def find_prefix(self, prefix):
+        """Interfaces with an address in exactly this prefix,
+        e.g. '10.1.1.0/24'.
+
+        Returns:
+            list: sorted (device ip, interface) tuples
+        """
+        address, masklen = _split(prefix)
+        if address is None:
+            return []
+        return sorted(self.networks.get(
+            (_network(address, masklen), masklen), ()))
+
+    def containing(self, address):
+        """Interfaces whose subnet contains an address, most specific
+        subnet first.
+
+        Returns:
+            list: ((device ip, interface), 'network/masklen') tuples
+        """
+        found = []
+        for masklen in sorted(self.masklens, reverse=True):
+            network = _network(address, masklen)
+            if network is None:
+                return []
+            owners = self.networks.get((network, masklen))
+            if owners:
+                subnet = '{0}/{1}'.format(
+                    socket.inet_ntoa(struct.pack('>I', network)), masklen)
+                found.extend((owner, subnet) for owner in sorted(owners))
+        return found
+
+    def get(self, device_ip, interface):
+        """The get_ipv4_index entry of one interface, None if unknown.
+        """
+        return self.interfaces.get(device_ip, {}).get(
+            _normalize_interface(interface))
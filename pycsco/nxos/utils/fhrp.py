@@ -26,77 +26,99 @@ Ansible modules and in addition, general development.
 """
 try:
     import xmltodict
+    from collections import OrderedDict
     from pycsco.nxos.device import Device
+    from pycsco.nxos.error import CLIError
+    from pycsco.nxos.utils.tables import Table
+    from pycsco.nxos.utils.nxapi_lib import get_command_bodies, \
+        execute_commands
 except ImportError as e:
     print '*' * 30
     print e
     print '*' * 30
 
-__all__ = []
+__all__ = ['get_vrrp_index', 'get_commands_vrrp_state', 'config_vrrp_state']
 
 
-def get_vrrp_existing(device, interface):
-    """Gets vrrp groups configured on each interface
+def _vrrp_preempt(value):
+    if value == 'Disable':
+        return False
+    elif value == 'Enable':
+        return True
+    return value
+
+
+VRRP_GROUP = Table('TABLE_vrrp_group', 'ROW_vrrp_group', [
+    ('group', 'sh_group_id', lambda value: value),
+    ('vip', 'sh_vip_addr', lambda value: value),
+    ('priority', 'sh_priority', lambda value: value),
+    ('preempt', 'sh_group_preempt', _vrrp_preempt),
+    ('auth', 'sh_auth_text', lambda value: value),
+    ('interval', 'sh_adv_interval', lambda value: value),
+])
+
+
+def _vrrp_rows(body):
+    # every group comes back in its own TABLE_vrrp_group
+    tables = body.get('TABLE_vrrp_group') if isinstance(body, dict) else None
+    if isinstance(tables, dict):
+        tables = [tables]
+    rows = []
+    for table in tables or []:
+        rows.extend(VRRP_GROUP.rows({'TABLE_vrrp_group': table}))
+    return rows
+
+
+def _vrrp_index_from_command(device, command, interface=None):
+    try:
+        body = get_command_bodies(device, [command])[0]
+    except CLIError:
+        # vrrp not enabled or no vrrp on the interface
+        return OrderedDict()
+    index = OrderedDict()
+    for row in _vrrp_rows(body):
+        name = str(row.get('sh_if_index') or interface).lower()
+        group = VRRP_GROUP.convert(row)
+        index[(name, group['group'])] = group
+    return index
+
+
+def get_vrrp_index(device):
+    """Gets every vrrp group of a device with a single 'show vrrp detail'
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
 
     Returns:
-        dict: k/v pairs in the form of interface/[group list]
+        OrderedDict: (interface, group) -> dict of the group's config
+            params as returned by get_existing_vrrp.  Interface names
+            are lower case.
 
     """
-    command = 'show vrrp detail interface ' + interface
-    xmlReturnData = device.show(command)
-    result = xmltodict.parse(xmlReturnData[1])
-    vrrp = []
-    try:
-        get_data = result['ins_api']['outputs']['output']['body'].get(
-            'TABLE_vrrp_group')
-        # ['ROW_vrrp_group']
-
-        # print type(get_data[0])
-        # print get_data[0]['ROW_vrrp_group']
-        try:
-            for entry in get_data:
-                get_dict = entry['ROW_vrrp_group']
-                group = get_dict.get('sh_group_id')
-                vip = get_dict.get('sh_vip_addr')
-                priority = get_dict.get('sh_priority')
-                preempt = get_dict.get('sh_group_preempt')
-                auth = get_dict.get('sh_auth_text')
-                interval = get_dict.get('sh_adv_interval')
-
-                if preempt == 'Disable':
-                    preempt = False
-                elif preempt == 'Enable':
-                    preempt = True
-
-                temp = dict(group=group, vip=vip, priority=priority,
-                            preempt=preempt, auth=auth, interval=interval)
-                vrrp.append(temp)
-
-        except TypeError:
-            get_dict = get_data['ROW_vrrp_group']
-
-            group = get_dict.get('sh_group_id')
-            vip = get_dict.get('sh_vip_addr')
-            priority = get_dict.get('sh_priority')
-            preempt = get_dict.get('sh_group_preempt')
-            auth = get_dict.get('sh_auth_text')
-            interval = get_dict.get('sh_adv_interval')
-            if preempt == 'Disable':
-                preempt = False
-            elif preempt == 'Enable':
-                preempt = True
-            temp = dict(group=group, vip=vip, priority=priority,
-                        preempt=preempt, auth=auth, interval=interval)
-            vrrp.append(temp)
-
-    except (KeyError, AttributeError):
-        vrrp = []
-
-    return vrrp
+    return _vrrp_index_from_command(device, 'show vrrp detail')
+
+
+def get_vrrp_existing(device, interface, index=None):
+    """Gets vrrp groups configured on an interface
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        interface (str): name of interface
+        index (dict): OPTIONAL - output of get_vrrp_index to use instead
+            of querying the device
+
+    Returns:
+        list: dict of config params per vrrp group
+
+    """
+    if index is None:
+        index = _vrrp_index_from_command(
+            device, 'show vrrp detail interface ' + interface, interface)
+    interface = interface.lower()
+    return [group for (name, _), group in index.iteritems()
+            if name == interface]
 
 
 def get_commands_config_vrrp(delta):
@@ -142,9 +164,9 @@ def get_commands_config_vrrp(delta):
     return commands
 
 
-def get_existing_vrrp(device, interface, group):
+def get_existing_vrrp(device, interface, group, index=None):
 
-    existing_groups = get_vrrp_existing(device, interface)
+    existing_groups = get_vrrp_existing(device, interface, index=index)
     existing = {}
     if existing_groups:
         for specific_group in existing_groups:
@@ -172,6 +194,75 @@ def get_commands_remove_vrrp(group):
     return commands
 
 
+def _vrrp_delta(desired, existing):
+    delta = {}
+    for key, value in desired.iteritems():
+        if value is None or key == 'group':
+            continue
+        if key == 'preempt':
+            if value != existing.get('preempt'):
+                delta[key] = value
+        elif str(value) != str(existing.get(key)):
+            delta[key] = value
+    return delta
+
+
+def get_commands_vrrp_state(desired, index):
+    """Gets the commands that bring vrrp on many interfaces to a desired
+    state
+
+    Args:
+        desired (dict): (interface, group) -> dict of vrrp params to
+            config (the keys of get_commands_config_vrrp), or None to
+            remove the group.  Groups that aren't listed are left alone.
+        index (dict): output of get_vrrp_index
+
+    Returns:
+        list: list of lists of commands, one list per interface, ready
+            for execute_commands
+
+    """
+    per_interface = OrderedDict()
+    for (interface, group), params in sorted(desired.iteritems()):
+        group = str(group)
+        existing = index.get((interface.lower(), group))
+        if params is None:
+            if existing:
+                commands = get_commands_remove_vrrp(group)
+            else:
+                continue
+        else:
+            delta = _vrrp_delta(params, existing or {})
+            if existing and not delta:
+                continue
+            commands = ['vrrp ' + group] + get_commands_config_vrrp(delta)
+        per_interface.setdefault(interface, []).extend(commands)
+
+    return [['interface ' + interface] + commands
+            for interface, commands in per_interface.iteritems()]
+
+
+def config_vrrp_state(device, desired, index=None):
+    """Brings vrrp on many interfaces to a desired state with a single
+    config request
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        desired (dict): see get_commands_vrrp_state
+        index (dict): OPTIONAL - output of get_vrrp_index, fetched if omitted
+
+    Returns:
+        list: the commands that were sent, see get_commands_vrrp_state
+
+    """
+    if index is None:
+        index = get_vrrp_index(device)
+    commands = get_commands_vrrp_state(desired, index)
+    execute_commands(device, commands)
+    return commands
+
+
 if __name__ == "__main__":
 
     device = Device(ip='n9396-2', username='cisco',
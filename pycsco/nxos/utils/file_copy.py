@@ -1,32 +1,309 @@
 from scp import SCPClient
 from pycsco.nxos.error import FileTransferError
+from pycsco.nxos.utils import filesystem
 
 import paramiko
 import hashlib
 import xmltodict
 import os
-import re
+import time
+import json
+import mmap
+import threading
+import atexit
+
+# size of the pieces a resumable transfer is written and verified in
+CHUNK_SIZE = 4 * 2**20
+
+# slice of a memory mapped file fed to md5 in one call
+HASH_SLICE = 64 * 2**20
+
+
+class LocalHashCache(object):
+    """MD5 sums of local files keyed on (path, size, mtime, inode) so a
+    file is only hashed again after it changes.  Entries are persisted
+    to ``path`` as JSON and shared by every FileCopy in the process.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = None
+
+    def _load(self):
+        self.entries = {}
+        if self.path and os.path.isfile(self.path):
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (IOError, ValueError):
+                pass
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        try:
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            tmp = '{0}.{1}'.format(self.path, os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f)
+            os.rename(tmp, self.path)
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def _key(path):
+        st = os.stat(path)
+        return path, [st.st_size, st.st_mtime, st.st_ino]
+
+    @staticmethod
+    def _hash(path, size, blocksize):
+        m = hashlib.md5()
+        if size:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for offset in xrange(0, size, blocksize):
+                        m.update(mapped[offset:offset + blocksize])
+                finally:
+                    mapped.close()
+        return m.hexdigest()
+
+    def md5(self, path, blocksize=HASH_SLICE):
+        path = os.path.abspath(path)
+        path, stamp = self._key(path)
+        with self.lock:
+            if self.entries is None:
+                self._load()
+            entry = self.entries.get(path)
+            if entry and entry[0] == stamp:
+                return entry[1]
+
+        digest = self._hash(path, stamp[0], blocksize)
+
+        with self.lock:
+            # the file may have changed while it was being hashed
+            if self._key(path)[1] == stamp:
+                self.entries[path] = [stamp, digest]
+                self._save()
+        return digest
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self._save()
+
+
+md5_cache = LocalHashCache(
+    os.path.join(os.path.expanduser('~'), '.pycsco', 'md5_cache.json'))
+
+
+class SSHSessionPool(object):
+    """Keeps one authenticated SSH connection per (host, port, username,
+    window size) so consecutive transfers to a device skip key exchange
+    and login.  Connections to different devices are opened concurrently.
+
+    Every ``get`` checks a session out and must be paired with a
+    ``release``.  A session that is checked out is never closed by the
+    pool; a discarded one is closed when its last user releases it.
+
+    Args:
+        keepalive (int): seconds between SSH keepalives on idle sessions
+        idle_timeout (int): seconds a session may go unused before it
+            is closed
+    """
+    def __init__(self, keepalive=30, idle_timeout=300):
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        # guards sessions, leases and key_locks, never held while connecting
+        self.lock = threading.Lock()
+        # key -> session, a session is
+        # [ssh, password, last released, users, key]
+        self.sessions = {}
+        # checked out SSHClient -> its session, pooled or discarded
+        self.leases = {}
+        # one lock per key so a device is only connected to once at a time
+        self.key_locks = {}
+
+    def _key_lock(self, key):
+        with self.lock:
+            lock = self.key_locks.get(key)
+            if lock is None:
+                lock = self.key_locks[key] = threading.Lock()
+            return lock
+
+    def _retire(self, key):
+        # drop the session from the pool, closing it unless it is in use
+        session = self.sessions.pop(key, None)
+        if session is not None and not session[3]:
+            session[0].close()
+
+    def evict_idle(self):
+        now = time.time()
+        with self.lock:
+            for key, session in self.sessions.items():
+                if not session[3] and now - session[2] > self.idle_timeout:
+                    self._retire(key)
+
+    def _checkout(self, session):
+        session[3] += 1
+        self.leases[session[0]] = session
+        return session[0]
+
+    def _reuse(self, key, password):
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                return None
+            transport = session[0].get_transport()
+            if session[1] == password and transport is not None \
+                    and transport.is_active():
+                return self._checkout(session)
+            self._retire(key)
+            return None
+
+    def get(self, hostname, port, username, password, window_size=None):
+        """Check out a connected paramiko.SSHClient for the device,
+        reusing an open session when there is one.  Hand it back with
+        ``release`` once the transfer is done.
+
+        The window size is set once on a new session's transport and is
+        part of the session's key, so a shared transport is never changed.
+        """
+        self.evict_idle()
+        key = (hostname, port, username, window_size)
+        ssh = self._reuse(key, password)
+        if ssh is not None:
+            return ssh
+
+        with self._key_lock(key):
+            # another thread may have connected while we waited
+            ssh = self._reuse(key, password)
+            if ssh is not None:
+                return ssh
+
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(
+                hostname=hostname,
+                username=username,
+                password=password,
+                port=port,
+                allow_agent=False,
+                look_for_keys=False)
+            transport = ssh.get_transport()
+            transport.set_keepalive(self.keepalive)
+            if window_size:
+                # only applies to channels opened from here on
+                transport.default_window_size = window_size
+            with self.lock:
+                self._retire(key)
+                session = [ssh, password, time.time(), 0, key]
+                self.sessions[key] = session
+                return self._checkout(session)
+
+    def release(self, ssh, failed=False):
+        """Hand back a session checked out with ``get``.
+
+        Args:
+            ssh (paramiko.SSHClient): the session
+            failed (bool): OPTIONAL - the transfer failed, so the session
+                is discarded rather than kept for reuse
+        """
+        with self.lock:
+            session = self.leases.get(ssh)
+            if session is None:
+                return
+            session[3] -= 1
+            session[2] = time.time()
+            key = session[4]
+            pooled = self.sessions.get(key) is session
+            if failed and pooled:
+                del self.sessions[key]
+                pooled = False
+            if not session[3]:
+                del self.leases[ssh]
+                if not pooled:
+                    ssh.close()
+
+    def discard(self, hostname, port, username, window_size=None):
+        """Drop the session for the device from the pool.  It is closed
+        now if unused, otherwise when its last user releases it.
+        """
+        with self.lock:
+            self._retire((hostname, port, username, window_size))
+
+    def close_all(self):
+        """Close every session, including the ones checked out.
+        """
+        with self.lock:
+            for ssh in self.leases.keys():
+                ssh.close()
+            for session in self.sessions.values():
+                session[0].close()
+            self.leases.clear()
+            self.sessions.clear()
+
+
+ssh_pool = SSHSessionPool()
+atexit.register(ssh_pool.close_all)
+
+
+class TransferProgress(object):
+    """Wraps a user callback and reports bytes transferred,
+    total bytes and throughput in bytes per second.
+    """
+    def __init__(self, callback, total, offset=0):
+        self.callback = callback
+        self.total = total
+        self.offset = offset
+        self.start = time.time()
+
+    def update(self, sent):
+        if self.callback is None:
+            return
+        elapsed = time.time() - self.start
+        rate = (sent - self.offset) / elapsed if elapsed > 0 else 0.0
+        self.callback(sent, self.total, rate)
+
+    def scp_progress(self, filename, size, sent):
+        self.total = size
+        self.update(sent)
 
 
 class FileCopy(object):
     """This class is used to copy local files to a NXOS device.
+
+    Args:
+        device (Device): NX-API enabled device
+        src (str): local file
+        dst (str): OPTIONAL - remote file, defaults to the name of ``src``
+        port (int): OPTIONAL - SSH port
+        window_size (int): OPTIONAL - SSH channel window size in bytes.
+            Larger windows keep high latency links busy.
+        buff_size (int): OPTIONAL - size of each SCP/SFTP write in bytes
+        chunk_size (int): OPTIONAL - size of the chunks resumable
+            transfers are verified in
+        progress (callable): OPTIONAL - called with
+            (bytes_transferred, total_bytes, bytes_per_second)
     """
-    def __init__(self, device, src, dst=None, port=22):
+    def __init__(self, device, src, dst=None, port=22, window_size=None,
+                 buff_size=16384, chunk_size=CHUNK_SIZE, progress=None):
         self.device = device
         self.src = src
         self.dst = dst or os.path.basename(src)
         self.port = port
+        self.window_size = window_size
+        self.buff_size = buff_size
+        self.chunk_size = chunk_size
+        self.progress = progress
 
     def get_flash_size(self):
-        """Return the available space in the remote directory.
+        """Return the available space on the filesystem of the
+        remote file.
         """
-        dir_out_dict = xmltodict.parse(self.device.show('dir', text=True)[1])
-        dir_out = dir_out_dict['ins_api']['outputs']['output']['body']
-
-        match = re.search(r'(\d+) bytes free', dir_out)
-        bytes_free = match.group(1)
-
-        return int(bytes_free)
+        return filesystem.bytes_free(self.device, self.dst)
 
     def get_remote_size(self):
         return self.get_flash_size()
@@ -65,13 +342,7 @@ class FileCopy(object):
         return self.file_already_exists()
 
     def remote_file_exists(self):
-        dir_dict = xmltodict.parse(self.device.show(
-            'dir {0}'.format(self.dst), text=True)[1])
-        dir_body = dir_dict['ins_api']['outputs']['output']['body']
-        if 'No such file' in dir_body:
-            return False
-
-        return True
+        return filesystem.path_exists(self.device, self.dst)
 
     def get_remote_md5(self):
         """Return the md5 sum of the remote file,
@@ -83,20 +354,133 @@ class FileCopy(object):
         if md5_body:
             return md5_body['file_content_md5sum']
 
-    def get_local_md5(self, blocksize=2**20):
+    def get_local_md5(self, blocksize=HASH_SLICE):
         """Get the md5 sum of the local file,
-        if it exists.
+        if it exists.  Sums are cached in ``md5_cache`` until the
+        file's size, mtime or inode changes.
         """
         if self.local_file_exists():
-            m = hashlib.md5()
-            with open(self.src, "rb") as f:
-                buf = f.read(blocksize)
-                while buf:
-                    m.update(buf)
-                    buf = f.read(blocksize)
-            return m.hexdigest()
-
-    def transfer_file(self, hostname=None, username=None, password=None, pull=False):
+            return md5_cache.md5(self.src, blocksize)
+
+    def _connect(self, hostname, username, password):
+        return ssh_pool.get(hostname, self.port, username, password,
+                            self.window_size)
+
+    def _sftp_path(self):
+        # SFTP on NX-OS exposes filesystems as top level directories
+        if ':' in self.dst:
+            fs, path = self.dst.split(':', 1)
+            return '/{0}/{1}'.format(fs, path.lstrip('/'))
+        return self.dst
+
+    def _chunk_ok(self, remote, local, offset, length):
+        """Compare one chunk of the remote file against the local file.
+        Uses the SFTP check-file extension when the server supports it,
+        otherwise reads the chunk back.
+        """
+        local.seek(offset)
+        local_hash = hashlib.md5(local.read(length)).digest()
+        try:
+            remote_hash = remote.check('md5', offset, length, length)
+        except IOError:
+            remote.seek(offset)
+            remote_hash = hashlib.md5(remote.read(length)).digest()
+        return remote_hash == local_hash
+
+    def _verified_offset(self, dst_file, src_file, size):
+        """Returns the offset a transfer can resume from.  The last
+        complete chunk already transferred is verified before it is
+        trusted, anything after it is sent again.
+        """
+        offset = (size // self.chunk_size) * self.chunk_size
+        while offset > 0:
+            start = offset - self.chunk_size
+            if self._chunk_ok(dst_file, src_file, start, self.chunk_size):
+                return offset
+            offset = start
+        return 0
+
+    def _resume_put(self, sftp):
+        total = os.path.getsize(self.src)
+        path = self._sftp_path()
+        try:
+            remote_size = sftp.stat(path).st_size
+        except IOError:
+            remote_size = 0
+
+        with open(self.src, 'rb') as local:
+            if remote_size:
+                remote = sftp.open(path, 'r+b')
+                offset = self._verified_offset(
+                    remote, local, min(remote_size, total))
+                remote.truncate(offset)
+            else:
+                remote = sftp.open(path, 'wb')
+                offset = 0
+
+            progress = TransferProgress(self.progress, total, offset)
+            try:
+                while offset < total:
+                    length = min(self.chunk_size, total - offset)
+                    local.seek(offset)
+                    remote.seek(offset)
+                    to_send = length
+                    while to_send:
+                        data = local.read(min(self.buff_size, to_send))
+                        remote.write(data)
+                        to_send -= len(data)
+                        progress.update(offset + length - to_send)
+                    remote.flush()
+                    if not self._chunk_ok(remote, local, offset, length):
+                        raise FileTransferError(
+                            'Could not transfer file. Chunk at offset '
+                            '{0} failed verification.'.format(offset))
+                    offset += length
+            finally:
+                remote.close()
+
+    def _resume_get(self, sftp):
+        path = self._sftp_path()
+        total = sftp.stat(path).st_size
+        local_size = 0
+        if os.path.isfile(self.src):
+            local_size = os.path.getsize(self.src)
+
+        remote = sftp.open(path, 'rb')
+        try:
+            with open(self.src, 'r+b' if local_size else 'w+b') as local:
+                offset = 0
+                if local_size:
+                    offset = self._verified_offset(
+                        remote, local, min(local_size, total))
+                    local.truncate(offset)
+
+                progress = TransferProgress(self.progress, total, offset)
+                while offset < total:
+                    length = min(self.chunk_size, total - offset)
+                    remote.seek(offset)
+                    local.seek(offset)
+                    to_read = length
+                    while to_read:
+                        data = remote.read(min(self.buff_size, to_read))
+                        if not data:
+                            raise FileTransferError(
+                                'Could not transfer file. Remote file '
+                                'ended early.')
+                        local.write(data)
+                        to_read -= len(data)
+                        progress.update(offset + length - to_read)
+                    local.flush()
+                    if not self._chunk_ok(remote, local, offset, length):
+                        raise FileTransferError(
+                            'Could not transfer file. Chunk at offset '
+                            '{0} failed verification.'.format(offset))
+                    offset += length
+        finally:
+            remote.close()
+
+    def transfer_file(self, hostname=None, username=None, password=None,
+                      pull=False, resume=False, retries=0):
         """Transfer the file to the remote device over SCP.
 
         Note:
@@ -110,6 +494,14 @@ class FileCopy(object):
                 for the remote device.
             password (str): OPTIONAL - The SSH password
                 for the remote device.
+            pull (bool): OPTIONAL - copy the remote file to ``src``
+                instead of sending ``src``.
+            resume (bool): OPTIONAL - transfer over SFTP in verified
+                chunks, continuing a partial file left by an earlier
+                attempt instead of starting over.  Requires
+                ``feature sftp-server`` on the device.
+            retries (int): OPTIONAL - number of times a resumable
+                transfer reconnects and continues after an error.
 
         Returns:
             True if successful.
@@ -130,27 +522,74 @@ class FileCopy(object):
         username = username or self.device.username
         password = password or self.device.password
 
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            hostname=hostname,
-            username=username,
-            password=password,
-            port=self.port,
-            allow_agent=False,
-            look_for_keys=False)
-
-        scp = SCPClient(ssh.get_transport())
         try:
-            if pull:
-                scp.get(self.dst, self.src)
-            else:
-                scp.put(self.src, self.dst)
-        except:
-            raise FileTransferError(
-                'Could not transfer file. There was an error during transfer.')
+            if resume:
+                return self._transfer_resumable(
+                    hostname, username, password, pull, retries)
+            return self._transfer_scp(hostname, username, password, pull)
         finally:
-            scp.close()
+            if not pull:
+                filesystem.invalidate(self.device, self.dst)
+
+    def _transfer_scp(self, hostname, username, password, pull):
+        ssh = self._connect(hostname, username, password)
+
+        progress = TransferProgress(self.progress, 0)
+        failed = True
+        try:
+            scp = SCPClient(ssh.get_transport(), buff_size=self.buff_size,
+                            progress=progress.scp_progress)
+            try:
+                if pull:
+                    scp.get(self.dst, self.src)
+                else:
+                    scp.put(self.src, self.dst)
+                failed = False
+            except:
+                raise FileTransferError(
+                    'Could not transfer file. There was an error during '
+                    'transfer.')
+            finally:
+                scp.close()
+        finally:
+            ssh_pool.release(ssh, failed)
+
+        return True
+
+    def _transfer_resumable(self, hostname, username, password, pull,
+                            retries):
+        attempt = 0
+        while True:
+            ssh = None
+            try:
+                ssh = self._connect(hostname, username, password)
+                sftp = ssh.open_sftp()
+                try:
+                    if pull:
+                        self._resume_get(sftp)
+                    else:
+                        self._resume_put(sftp)
+                finally:
+                    sftp.close()
+                ssh_pool.release(ssh)
+                break
+            except FileTransferError:
+                if ssh is not None:
+                    ssh_pool.release(ssh)
+                raise
+            except Exception:
+                if ssh is not None:
+                    ssh_pool.release(ssh, failed=True)
+                attempt += 1
+                if attempt > retries:
+                    raise FileTransferError(
+                        'Could not transfer file. There was an error during '
+                        'transfer. Run again with resume=True to continue.')
+
+        if self.get_local_md5() != self.get_remote_md5():
+            raise FileTransferError(
+                'Could not transfer file. MD5 of the transferred file '
+                'doesn\'t match.')
 
         return True
 
@@ -159,3 +598,66 @@ class FileCopy(object):
 
     def get(self):
         self.transfer_file(pull=True)
+
+
+def transfer_files(device, files, dst='bootflash:', pull=False, port=22,
+                   buff_size=16384, progress=None):
+    """Copy several files over a single SCP session.
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        files (list): local files to send, or remote file names to
+            fetch when ``pull`` is True
+        dst (str): remote directory when sending, local directory
+            when pulling
+        pull (bool): OPTIONAL - fetch ``files`` from the device
+        port (int): OPTIONAL - SSH port
+        buff_size (int): OPTIONAL - size of each SCP write in bytes
+        progress (callable): OPTIONAL - called with
+            (bytes_transferred, total_bytes, bytes_per_second) per file
+
+    Returns:
+        True if successful.
+
+    Raises:
+        FileTransferError: if the transfer isn't successful.
+    """
+    if not pull:
+        missing = [f for f in files if not os.path.isfile(f)]
+        if missing:
+            raise FileTransferError(
+                'Could not transfer files. Local files don\'t exist: '
+                '{0}'.format(', '.join(missing)))
+
+        needed = sum(os.path.getsize(f) for f in files)
+        free = filesystem.bytes_free(device, dst)
+        # free space is None when dir doesn't report it, let the copy try
+        if free is not None and needed > free:
+            raise FileTransferError(
+                'Could not transfer files. Not enough space on device.')
+
+    ssh = ssh_pool.get(device.ip, port, device.username, device.password)
+    tracker = TransferProgress(progress, 0)
+    failed = True
+    try:
+        scp = SCPClient(ssh.get_transport(), buff_size=buff_size,
+                        progress=tracker.scp_progress)
+        try:
+            if pull:
+                scp.get(list(files), dst)
+            else:
+                scp.put(list(files), dst)
+            failed = False
+        except:
+            raise FileTransferError(
+                'Could not transfer files. There was an error during '
+                'transfer.')
+        finally:
+            scp.close()
+            if not pull:
+                filesystem.invalidate(device, dst)
+    finally:
+        ssh_pool.release(ssh, failed)
+
+    return True
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Jason Edelman <jedelman8@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Structured view of the switch filesystems built from ``dir`` output.
+Listings are cached per device and per directory until they are
+invalidated by a change made through pycsco (mkdir, delete, file copy)
+or refreshed explicitly.
+"""
+try:
+    import xmltodict
+    import re
+    import datetime
+    import threading
+    import weakref
+    from collections import namedtuple, OrderedDict
+    from pycsco.nxos.error import CLIError
+except ImportError as e:
+    print '*' * 30
+    print e
+    print '*' * 30
+
+__all__ = ['DirEntry', 'parse_dir', 'normalize_path', 'split_path',
+           'list_dir', 'get_entry', 'path_exists', 'bytes_free',
+           'invalidate']
+
+DEFAULT_FS = 'bootflash:'
+
+DirEntry = namedtuple('DirEntry', ['name', 'size', 'mtime', 'is_dir'])
+
+_ENTRY_RE = re.compile(
+    r'^\s*(\d+)\s+(\w{3}\s+\d+\s+\d+:\d+:\d+\s+\d{4})\s+(\S.*?)\s*$')
+_USAGE_RE = re.compile(r'^\s*(\d+) bytes (used|free|total)')
+
+_cache = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _parse_mtime(text):
+    try:
+        return datetime.datetime.strptime(
+            ' '.join(text.split()), '%b %d %H:%M:%S %Y')
+    except ValueError:
+        return None
+
+
+def parse_dir(output):
+    """Parse the text output of ``dir``
+
+    Args:
+        output (str): text body of a ``dir`` command
+
+    Returns:
+        dict: ``entries`` is an OrderedDict of name -> DirEntry (names
+        of directories keep their trailing '/'), ``used``, ``free`` and
+        ``total`` are bytes for the filesystem or None if not reported
+    """
+    listing = {'entries': OrderedDict(), 'used': None, 'free': None,
+               'total': None}
+    for line in output.splitlines():
+        match = _ENTRY_RE.match(line)
+        if match:
+            size, mtime, name = match.groups()
+            listing['entries'][name] = DirEntry(
+                name, int(size), _parse_mtime(mtime), name.endswith('/'))
+            continue
+        match = _USAGE_RE.match(line)
+        if match:
+            listing[match.group(2)] = int(match.group(1))
+
+    return listing
+
+
+def normalize_path(path):
+    """Return ``path`` as 'fs:dir/sub/' (or 'fs:' for the root) so
+    every spelling of a directory maps to the same cache entry.
+    """
+    if ':' in path:
+        fs, rest = path.split(':', 1)
+        fs += ':'
+    else:
+        fs, rest = DEFAULT_FS, path
+    rest = '/'.join(part for part in rest.split('/') if part)
+    return fs + (rest + '/' if rest else '')
+
+
+def split_path(path):
+    """Split a file or directory path into its normalized parent
+    directory and its name.
+
+    Returns:
+        tuple: (parent, name), name is '' for a filesystem root
+    """
+    full = normalize_path(path)
+    fs, rest = full.split(':', 1)
+    rest = rest.rstrip('/')
+    if not rest:
+        return fs + ':', ''
+    parent, _, name = rest.rpartition('/')
+    return normalize_path(fs + ':' + parent), name
+
+
+def _device_cache(device):
+    cache = _cache.get(device)
+    if cache is None:
+        cache = _cache[device] = {}
+    return cache
+
+
+def _listing(device, path, refresh=False):
+    # the cached listing itself, callers must not modify it
+    path = normalize_path(path)
+    with _lock:
+        cache = _device_cache(device)
+        if not refresh and path in cache:
+            return cache[path]
+
+    command = 'dir ' + path
+    try:
+        data = device.show(command, text=True)
+        data_dict = xmltodict.parse(data[1])
+        body = data_dict['ins_api']['outputs']['output']['body']
+    except (KeyError, CLIError):
+        body = None
+
+    if not body or 'No such file' in body:
+        listing = None
+    else:
+        listing = parse_dir(body)
+
+    with _lock:
+        _device_cache(device)[path] = listing
+    return listing
+
+
+def list_dir(device, path=DEFAULT_FS, refresh=False):
+    """Get the listing of a directory, using the cached copy when there
+    is one.
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        path (str): path of a dir on switch
+        refresh (bool): OPTIONAL - ignore the cached listing
+
+    Returns:
+        dict: see ``parse_dir``, a copy the caller is free to modify
+        None, if the path does not exist
+    """
+    listing = _listing(device, path, refresh)
+    if listing is None:
+        return None
+    listing = dict(listing)
+    listing['entries'] = OrderedDict(listing['entries'])
+    return listing
+
+
+def get_entry(device, path):
+    """Look up a file or directory.
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        path (str): path of a file or dir on switch
+
+    Returns:
+        DirEntry, or None if it doesn't exist
+    """
+    parent, name = split_path(path)
+    listing = _listing(device, parent)
+    if not listing or not name:
+        return None
+    entries = listing['entries']
+    return entries.get(name) or entries.get(name + '/')
+
+
+def path_exists(device, path):
+    """Checks to see if a file or directory exists
+
+    Returns:
+        bool: true if exists, else false
+    """
+    parent, name = split_path(path)
+    if not name:
+        return _listing(device, parent) is not None
+    return get_entry(device, path) is not None
+
+
+def bytes_free(device, path=DEFAULT_FS):
+    """Return the free bytes of the filesystem ``path`` lives on.
+    """
+    fs = normalize_path(path).split(':', 1)[0] + ':'
+    listing = _listing(device, fs)
+    if listing:
+        return listing['free']
+
+
+def invalidate(device, path=None):
+    """Drop cached listings after the filesystem was changed.
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        path (str): OPTIONAL - the file or dir that was created, removed or
+            written.  Its parent, itself and anything below it are dropped,
+            as is the filesystem root so free space is fetched again.
+            All listings of the device are dropped if omitted.
+    """
+    with _lock:
+        cache = _cache.get(device)
+        if not cache:
+            return
+        if path is None:
+            cache.clear()
+            return
+        parent, name = split_path(path)
+        fs = parent.split(':', 1)[0] + ':'
+        target = normalize_path(path)
+        for key in cache.keys():
+            if key in (parent, fs) or key.startswith(target):
+                del cache[key]
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Jason Edelman <jedelman8@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Collect facts from many devices at once, optionally re-fetching only
+the parts that may have changed since the last poll.
+"""
+try:
+    import re
+    import time
+    import threading
+    from pycsco.nxos.error import CLIError
+    from pycsco.nxos.utils import parallel
+    from pycsco.nxos.utils.nxapi_lib import get_facts, get_command_bodies, \
+        get_interface_detail, FACTS_COMMANDS, _get_facts_bodies, \
+        _facts_from_bodies, _interface_detail_from_body
+except ImportError as e:
+    print '*' * 30
+    print e
+    print '*' * 30
+
+__all__ = ['iter_facts', 'get_fleet_facts', 'FactsCollector']
+
+INDICATOR_COMMANDS = ['show version', 'show accounting log last-index']
+
+# section -> (events that make it stale, max age in seconds or None)
+DEFAULT_POLICY = {
+    'show version': (('reboot', 'config'), None),
+    'show interface status': ((), 0),
+    'show module': (('reboot',), 3600),
+    'show environment': (('reboot',), 300),
+    'show vlan brief': (('reboot', 'config'), None),
+    'interface_detail': (('reboot', 'config'), 300),
+}
+
+_UPTIME_RE = re.compile(
+    r'uptime is (\d+) day\(s\), (\d+) hour\(s\), (\d+) minute\(s\), '
+    r'(\d+) second')
+_LAST_INDEX_RE = re.compile(r'last-index\s*:\s*(\d+)')
+
+
+def iter_facts(devices, workers=parallel.DEFAULT_WORKERS):
+    """Gets facts from many devices in parallel
+
+    Args:
+        devices (list): Device objects of NX-API enabled devices
+        workers (int): OPTIONAL - number of devices polled at once
+
+    Returns:
+        generator: (device, facts, exception) tuples as each device
+        finishes.  ``exception`` is None on success.
+
+    """
+    return parallel.iter_results(get_facts, devices, workers)
+
+
+def get_fleet_facts(devices, workers=parallel.DEFAULT_WORKERS,
+                    callback=None):
+    """Gets facts from many devices in parallel
+
+    Args:
+        devices (list): Device objects of NX-API enabled devices
+        workers (int): OPTIONAL - number of devices polled at once
+        callback (callable): OPTIONAL - called with (device, facts, exception)
+            as soon as each device finishes
+
+    Returns:
+        tuple: dict of device ip -> facts and dict of device ip ->
+        exception for the devices that failed
+
+    """
+    facts = {}
+    errors = {}
+    for device, result, error in iter_facts(devices, workers):
+        if callback:
+            callback(device, result, error)
+        if error is None:
+            facts[device.ip] = result
+        else:
+            errors[device.ip] = error
+    return facts, errors
+
+
+def _delta(old, new):
+    delta = {}
+    for key, value in new.iteritems():
+        previous = old.get(key)
+        if key == 'interface_detail':
+            previous = previous or {}
+            changed = dict(
+                (intf, {'old': previous.get(intf), 'new': detail})
+                for intf, detail in value.iteritems()
+                if previous.get(intf) != detail)
+            if changed:
+                delta[key] = changed
+        elif previous != value:
+            delta[key] = {'old': previous, 'new': value}
+    return delta
+
+
+class FactsCollector(object):
+    """Polls facts repeatedly, re-fetching a section only when it may
+    have changed.
+
+    Each poll starts with one cheap text request for the uptime and the
+    accounting log index.  A lower uptime means the device rebooted and
+    a new accounting index means configuration was entered.  Sections
+    are fetched again when one of their events fired or when they are
+    older than their max age, see DEFAULT_POLICY.  Interface details are
+    also fetched again when the interface's row in
+    'show interface status' changed.
+
+    Args:
+        interfaces (list): OPTIONAL - interfaces to include
+            get_interface_detail output for, under 'interface_detail'
+        policy (dict): OPTIONAL - overrides for DEFAULT_POLICY
+    """
+    def __init__(self, interfaces=None, policy=None):
+        self.interfaces = list(interfaces or [])
+        self.policy = dict(DEFAULT_POLICY)
+        self.policy.update(policy or {})
+        self.lock = threading.Lock()
+        self.state = {}
+
+    def _indicators(self, device):
+        try:
+            bodies = get_command_bodies(device, INDICATOR_COMMANDS, text=True)
+        except CLIError:
+            return {}
+
+        indicators = {}
+        match = _UPTIME_RE.search(bodies[0] or '')
+        if match:
+            days, hours, minutes, seconds = [int(x) for x in match.groups()]
+            indicators['uptime'] = (
+                ((days * 24 + hours) * 60 + minutes) * 60 + seconds)
+        match = _LAST_INDEX_RE.search(bodies[1] or '')
+        if match:
+            indicators['config_index'] = int(match.group(1))
+        return indicators
+
+    @staticmethod
+    def _events(old, new):
+        if old is None:
+            return set(['reboot', 'config'])
+        events = set()
+        if 'uptime' not in new or new['uptime'] < old.get('uptime', 0):
+            events.add('reboot')
+        if 'config_index' not in new or \
+                new['config_index'] != old.get('config_index'):
+            events.add('config')
+        return events
+
+    def _stale(self, section, key, events, fetched, now):
+        if key not in fetched:
+            return True
+        triggers, max_age = self.policy[section]
+        if events.intersection(triggers):
+            return True
+        return max_age is not None and now - fetched[key] >= max_age
+
+    def _fetch_details(self, device, interfaces):
+        commands = ['show interface ' + intf for intf in interfaces]
+        try:
+            return [_interface_detail_from_body(body)
+                    for body in get_command_bodies(device, commands)]
+        except CLIError:
+            return [get_interface_detail(device, intf)
+                    for intf in interfaces]
+
+    def collect(self, device):
+        """Gets facts about the network device
+
+        Args:
+            device (Device): This is the device object of an NX-API enabled
+                device using the Device class within device.py
+
+        Returns:
+            tuple: the full facts (as get_facts, plus 'interface_detail'
+            when interfaces were given) and a dict of the keys that
+            changed since the previous poll, each mapped to
+            {'old': ..., 'new': ...}
+
+        """
+        with self.lock:
+            state = self.state.setdefault(device.ip, {
+                'indicators': None, 'bodies': {}, 'fetched': {},
+                'details': {}, 'facts': {}})
+
+        now = time.time()
+        indicators = self._indicators(device)
+        events = self._events(state['indicators'], indicators)
+        fetched = state['fetched']
+
+        stale = [command for command in FACTS_COMMANDS
+                 if self._stale(command, command, events, fetched, now)]
+        if stale:
+            for command, body in zip(stale, _get_facts_bodies(device, stale)):
+                state['bodies'][command] = body
+                fetched[command] = now
+
+        old_facts = state['facts']
+        facts = _facts_from_bodies(
+            *[state['bodies'][command] for command in FACTS_COMMANDS])
+
+        if self.interfaces:
+            old_rows = dict((row['interface'], row) for row in
+                            old_facts.get('interfaces_detail', []))
+            for row in facts['interfaces_detail']:
+                if old_rows.get(row['interface']) != row:
+                    fetched.pop(('interface_detail', row['interface']), None)
+
+            details = state['details']
+            stale = [intf for intf in self.interfaces
+                     if self._stale('interface_detail',
+                                    ('interface_detail', intf),
+                                    events, fetched, now)]
+            if stale:
+                for intf, detail in zip(
+                        stale, self._fetch_details(device, stale)):
+                    details[intf] = detail
+                    fetched[('interface_detail', intf)] = now
+            facts['interface_detail'] = dict(details)
+
+        state['indicators'] = indicators
+        state['facts'] = facts
+        return facts, _delta(old_facts, facts)
+
+    def iter_collect(self, devices, workers=parallel.DEFAULT_WORKERS):
+        """Polls many devices in parallel
+
+        Returns:
+            generator: (device, (facts, delta), exception) tuples as each
+            device finishes
+
+        """
+        return parallel.iter_results(self.collect, devices, workers)
+
+    def forget(self, device=None):
+        """Drop the remembered snapshot of one device, or of all devices,
+        so the next poll fetches everything.
+        """
+        with self.lock:
+            if device is None:
+                self.state.clear()
+            else:
+                self.state.pop(device.ip, None)
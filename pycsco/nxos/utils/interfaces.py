@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Jason Edelman <jedelman8@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compact column store for large interface inventories.
+
+Fields with few distinct values (state, speed, duplex, ...) are kept as
+small integer codes in arrays, the codes pointing into code books that
+are shared by every InterfaceTable in the process.  Other fields are
+kept as lists of interned strings.  Rows are turned back into the dicts
+get_facts / get_interface_detail return only when asked for.
+"""
+try:
+    import array
+    import threading
+    from pycsco.nxos.utils.nxapi_lib import get_command_bodies, \
+        get_interface_type, INTERFACE_STATUS, INTERFACE_DETAIL
+except ImportError as e:
+    print '*' * 30
+    print e
+    print '*' * 30
+
+__all__ = ['InterfaceTable', 'get_interface_table', 'ENUM_FIELDS']
+
+# fields whose values repeat across interfaces and devices
+ENUM_FIELDS = frozenset([
+    'state', 'admin_state', 'share_state', 'duplex', 'speed', 'type',
+    'vlan', 'mode', 'medium', 'media', 'autoneg', 'mtu', 'bw', 'delay',
+    'reliability', 'in_flowctrl', 'out_flowctrl', 'mdix', 'ratemode',
+    'swt_monitor', 'ethertype', 'eee_state', 'hw_desc', 'tx_load',
+    'rx_load', 'load_interval1_rx', 'load_interval1_tx',
+])
+
+
+class _CodeBook(object):
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+        self.lock = threading.Lock()
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+
+_code_books = {}
+_code_books_lock = threading.Lock()
+
+
+def _code_book(field):
+    with _code_books_lock:
+        book = _code_books.get(field)
+        if book is None:
+            book = _code_books[field] = _CodeBook()
+        return book
+
+
+def _intern(value):
+    if type(value) is str:
+        return intern(value)
+    return value
+
+
+class InterfaceTable(object):
+    """Interfaces of one device stored column-wise.
+
+    Args:
+        rows (iterable): interface dicts (or LazyRecord rows), all with
+            the same keys, including 'interface'
+        enums (set): OPTIONAL - fields stored as codes, see ENUM_FIELDS
+    """
+    __slots__ = ('fields', 'names', 'columns', 'books', 'positions')
+
+    def __init__(self, rows, enums=ENUM_FIELDS):
+        rows = list(rows)
+        self.fields = list(rows[0]) if rows else ['interface']
+        self.names = [_intern(row['interface']) for row in rows]
+        self.positions = dict((name, i) for i, name in enumerate(self.names))
+        self.columns = {}
+        self.books = {}
+        for field in self.fields:
+            if field == 'interface':
+                continue
+            if field in enums:
+                book = self.books[field] = _code_book(field)
+                codes = [book.encode(row[field]) for row in rows]
+                typecode = 'H' if max(codes or [0]) <= 0xffff else 'L'
+                self.columns[field] = array.array(typecode, codes)
+            else:
+                self.columns[field] = [_intern(row[field]) for row in rows]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, interface):
+        return interface in self.positions
+
+    def value(self, interface, field):
+        """Value of one field of one interface
+        """
+        if field == 'interface':
+            return self.names[self.positions[interface]]
+        return self._cell(field, self.positions[interface])
+
+    def _cell(self, field, index):
+        book = self.books.get(field)
+        if book is not None:
+            return book.values[self.columns[field][index]]
+        return self.columns[field][index]
+
+    def column(self, field):
+        """All values of a field, in interface order
+        """
+        if field == 'interface':
+            return list(self.names)
+        book = self.books.get(field)
+        if book is not None:
+            values = book.values
+            return [values[code] for code in self.columns[field]]
+        return list(self.columns[field])
+
+    def where(self, field, value):
+        """Names of the interfaces whose ``field`` equals ``value``
+        """
+        book = self.books.get(field)
+        if book is not None:
+            code = book.codes.get(value)
+            if code is None:
+                return []
+            return [self.names[i] for i, each in
+                    enumerate(self.columns[field]) if each == code]
+        return [self.names[i] for i, each in
+                enumerate(self.columns[field]) if each == value]
+
+    def to_dict(self, interface):
+        """One interface in the dict shape of the getters
+        """
+        index = self.positions[interface]
+        row = dict((field, self._cell(field, index))
+                   for field in self.columns)
+        row['interface'] = self.names[index]
+        return row
+
+    def to_dicts(self):
+        """All interfaces in the dict shape of the getters
+        """
+        return [self.to_dict(name) for name in self.names]
+
+    def by_type(self):
+        """Interface names grouped like get_interfaces_dict
+        """
+        interfaces = dict((key, []) for key in (
+            'ethernet', 'svi', 'loopback', 'management', 'portchannel',
+            'unknown'))
+        for name in self.names:
+            interfaces[get_interface_type(name)].append(name)
+        return interfaces
+
+
+def get_interface_table(device, detail=False):
+    """Gets all interfaces of a device as an InterfaceTable
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        detail (bool): OPTIONAL - use 'show interface' (the fields of
+            get_interface_detail) instead of 'show interface status'
+            (the fields of get_facts' interfaces_detail)
+
+    Returns:
+        InterfaceTable
+
+    """
+    if detail:
+        command, table = 'show interface', INTERFACE_DETAIL
+    else:
+        command, table = 'show interface status', INTERFACE_STATUS
+    body = get_command_bodies(device, [command])[0]
+    # lazy rows skip building an intermediate dict per interface
+    return InterfaceTable(table.lazy(body))
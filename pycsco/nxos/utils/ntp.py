@@ -1,6 +1,5 @@
 try:
     import xmltodict
-    from pycsco.nxos.utils import legacy
 except ImportError as e:
     print '*' * 30
     print e
@@ -8,7 +7,109 @@ except ImportError as e:
 
 __all__ = ['get_ntp_existing', 'config_ntp', 'disable_ntp_server_peer',
            'get_ntp_auth_info', 'set_ntp_auth_key', 'remove_ntp_auth_key',
-           'config_ntp_options', 'get_ntp_options']
+           'config_ntp_options', 'get_ntp_options', 'NtpState',
+           'get_ntp_state']
+
+
+class NtpState(object):
+    '''All of the NTP configuration of a device, parsed from the text of
+    'show running-config ntp' in a single pass.  Every NTP getter accepts
+    one as ``state`` instead of querying the device itself.
+
+    Args:
+        config (string): text of 'show running-config ntp'
+    '''
+    def __init__(self, config):
+        # list of dicts shaped like the ones get_ntp_serv_peer returns
+        self.serv_peer_list = []
+        # (serv_peer, address) -> dict in serv_peer_list
+        self.serv_peers = {}
+        # key id -> dict shaped like get_ntp_auth_key's
+        self.auth_keys = {}
+        self.trusted_keys = []
+        self.authentication = False
+        self.logging = 'false'
+        self.master = 'false'
+        self.stratum = None
+        self.source_type = None
+        self.source_addr_int = None
+
+        for line in (config or '').split('\n'):
+            words = line.split()
+            if len(words) < 2 or words[0] != 'ntp':
+                continue
+            self._parse(words)
+
+    def _parse(self, words):
+        keyword = words[1]
+        if keyword in ('server', 'peer') and len(words) > 2:
+            entry = {'serv_peer': str(keyword), 'address': str(words[2]),
+                     'prefer': 'disabled', 'key_id': '', 'vrf_name': ''}
+            options = iter(words[3:])
+            for option in options:
+                if option == 'prefer':
+                    entry['prefer'] = 'enabled'
+                elif option == 'key':
+                    entry['key_id'] = str(next(options, ''))
+                elif option == 'use-vrf':
+                    entry['vrf_name'] = str(next(options, ''))
+            self.serv_peer_list.append(entry)
+            self.serv_peers[(keyword, entry['address'])] = entry
+        elif keyword == 'authentication-key' and len(words) > 4:
+            self.auth_keys.setdefault(str(words[2]), {
+                'key_id': str(words[2]), 'md5string': str(words[4])})
+        elif keyword in ('trusted-key', 'trusted-keys') and len(words) > 2:
+            self.trusted_keys.append(str(words[2]))
+        elif keyword == 'authenticate':
+            self.authentication = True
+        elif keyword == 'logging':
+            self.logging = 'true'
+        elif keyword == 'master':
+            self.master = 'true'
+            self.stratum = str(words[2]) if len(words) > 2 else None
+        elif keyword in ('source', 'source-interface') and len(words) > 2:
+            self.source_type = str(keyword)
+            self.source_addr_int = str(words[2]).lower()
+
+    def existing(self, address, serv_peer):
+        '''See get_ntp_existing
+        '''
+        existing = dict(self.serv_peers.get((serv_peer, address), {}))
+        existing['serv_peer_list'] = [dict(each)
+                                      for each in self.serv_peer_list]
+        existing['source_type'] = self.source_type
+        existing['source_addr_int'] = self.source_addr_int
+        return existing
+
+    def auth_info(self, key_id):
+        '''See get_ntp_auth_info
+        '''
+        auth_info = dict(self.auth_keys.get(str(key_id), {}))
+        auth_info['trusted_key'] = \
+            'true' if str(key_id) in self.trusted_keys else 'false'
+        auth_info['authentication'] = 'on' if self.authentication else 'off'
+        return auth_info
+
+    def options(self):
+        '''See get_ntp_options
+        '''
+        return {'logging': self.logging, 'master': self.master,
+                'stratum': self.stratum}
+
+
+def get_ntp_state(device):
+    '''Returns the NTP configuration of a device from a single request.
+
+    Args:
+        device (Device): NX-API enabled device from which to retrieve configration
+
+    Returns:
+        An NtpState
+    '''
+    response = device.show('show running-config ntp', text=True)
+    config = xmltodict.parse(
+        response[1])['ins_api']['outputs']['output']['body']
+    return NtpState(config)
 
 
 def _auth_type_to_num(auth_type):
@@ -66,98 +167,53 @@ def disable_ntp_logging():
     return 'no ntp logging'
 
 
-def get_ntp_auth_key(device, key_id):
-    ntp_auth_cfg_response = device.show(
-        'show run | inc "ntp authentication-key {0}"'.format(key_id),
-        text=True)
-    ntp_auth_run_cfg = xmltodict.parse(
-        ntp_auth_cfg_response[1])['ins_api']['outputs']['output']['body']
-    ntp_auth_data = legacy.get_structured_data(
-        'ntp_auth.tmpl', ntp_auth_run_cfg)
-    if len(ntp_auth_data) > 0:
-        return ntp_auth_data[0]
-
-    return {}
-
+def get_ntp_auth_key(device, key_id, state=None):
+    if state is None:
+        state = get_ntp_state(device)
 
-def get_ntp_auth(device):
-    response = device.show(
-        'show ntp authentication-status')
-    response_dict = xmltodict.parse(response[1])
-    ntp_auth_str = response_dict['ins_api']['outputs']['output']['body']['authentication']
-    ntp_auth = True if 'enabled' in ntp_auth_str else False
+    return dict(state.auth_keys.get(str(key_id), {}))
 
-    return ntp_auth
 
+def get_ntp_auth(device, state=None):
+    if state is None:
+        state = get_ntp_state(device)
 
-def get_ntp_log(device):
-    response = device.show(
-        'show ntp logging')
-    response_dict = xmltodict.parse(response[1])
-    ntp_log_str = response_dict['ins_api']['outputs']['output']['body']['loggingstatus']
-    ntp_log = 'true' if 'enabled' in ntp_log_str else 'false'
+    return state.authentication
 
-    return ntp_log
 
+def get_ntp_log(device, state=None):
+    if state is None:
+        state = get_ntp_state(device)
 
-def get_ntp_master(device):
-    response = device.show(
-        'show run | inc "ntp master"', text=True)
-    response_dict = xmltodict.parse(response[1])
-    master_str = response_dict['ins_api']['outputs']['output']['body']
-    master = 'true' if master_str else 'false'
-    stratum = str(master_str.split()[2]) if master == 'true' else None
+    return state.logging
 
-    return master, stratum
 
+def get_ntp_master(device, state=None):
+    if state is None:
+        state = get_ntp_state(device)
 
-def get_ntp_trusted_key(device):
-    trusted_key_list = []
+    return state.master, state.stratum
 
-    response = device.show(
-        'show run | inc "ntp trusted-key"', text=True)
-    response_dict = xmltodict.parse(response[1])
-    trusted_key_str = response_dict['ins_api']['outputs']['output']['body']
-    trusted_keys = trusted_key_str.split('\n') if trusted_key_str else []
-    for line in trusted_keys:
-        trusted_key_list.append(str(line.split()[2]))
 
-    return trusted_key_list
+def get_ntp_trusted_key(device, state=None):
+    if state is None:
+        state = get_ntp_state(device)
 
+    return list(state.trusted_keys)
 
-def get_ntp_serv_peer(device):
-    response = device.show(
-        'show run | inc "ntp (server|peer)"', text=True)
-    response_dict = xmltodict.parse(response[1])
-    serv_peer_str = response_dict['ins_api']['outputs']['output']['body']
-    serv_peer_list = legacy.get_structured_data(
-        'ntp_server_peer.tmpl', serv_peer_str)
-    for serv_peer in serv_peer_list:
-        if serv_peer['prefer']:
-            serv_peer['prefer'] = 'enabled'
-        else:
-            serv_peer['prefer'] = 'disabled'
 
-    return serv_peer_list
+def get_ntp_serv_peer(device, state=None):
+    if state is None:
+        state = get_ntp_state(device)
 
+    return [dict(each) for each in state.serv_peer_list]
 
-def get_ntp_source(device):
-    source_type = None
-    source_addr_int = None
 
-    response = device.show(
-        'show run | inc "ntp source"', text=True)
-    response_dict = xmltodict.parse(response[1])
-    source_text = response_dict['ins_api']['outputs']['output']['body']
-    if source_text:
-        if 'interface' in source_text:
-            source_type = 'source-interface'
-        else:
-            source_type = 'source'
+def get_ntp_source(device, state=None):
+    if state is None:
+        state = get_ntp_state(device)
 
-        source_addr_int = source_text.split()[2].lower()
-
-    return source_type, source_addr_int
+    return state.source_type, state.source_addr_int
 
 
 def set_ntp_auth_key(key_id, md5string, auth_type, trusted_key, authentication):
@@ -239,17 +295,25 @@ def config_ntp_options(delta, flip=False):
     return ntp_cmds
 
 
-def config_ntp(delta, existing):
+def config_ntp(delta, existing=None, state=None):
     '''Returns the configuration commands for configuring an NTP peer or server
        using the given parameters.
 
     Args:
         delta (dictionary): The primary dictionary of parameters
         existing (dictionary): The secondary dictionary of parameters
+        state (NtpState): OPTIONAL - used to look up ``existing`` for the
+            server or peer in ``delta`` when ``existing`` isn't given
 
     Returns:
         A list of configuration command(s) for configuring NTP with the given parameters
     '''
+    if existing is None:
+        existing = {}
+        if state is not None:
+            existing = state.existing(delta.get('address'),
+                                      delta.get('serv_peer'))
+
     address = delta.get('address')
     serv_peer = delta.get('serv_peer')
     vrf_name = delta.get('vrf_name')
@@ -348,69 +412,52 @@ def disable_ntp_source(src_srcint, src_addr_int):
         src_srcint, src_addr_int)
 
 
-def get_ntp_existing(device, address, serv_peer):
+def get_ntp_existing(device, address, serv_peer, state=None):
     '''Returns the NTP configuration on a given device for a specified server or peer.
 
     Args:
         device (Device): NX-API enabled device from which to retrieve configration
         address (string): Address of server or peer
         serv_peer (string): "server" or "peer"
+        state (NtpState): OPTIONAL - output of get_ntp_state, fetched if omitted
 
     Returns:
         A dictionary of NTP configuration parameters for the server or peer
     '''
-    existing = {}
+    if state is None:
+        state = get_ntp_state(device)
 
-    serv_peer_list = get_ntp_serv_peer(device)
-    for serv_peer_dict in serv_peer_list:
-        if serv_peer_dict['address'] == address:
-            if serv_peer_dict['serv_peer'] == serv_peer:
-                existing.update(serv_peer_dict)
+    return state.existing(address, serv_peer)
 
-    existing['serv_peer_list'] = serv_peer_list
-    existing['source_type'], existing['source_addr_int'] = get_ntp_source(device)
 
-    return existing
-
-
-def get_ntp_auth_info(device, key_id):
+def get_ntp_auth_info(device, key_id, state=None):
     '''Returns the NTP authentication configuration on a given device.
 
     Args:
         device (Device): NX-API enabled device from which to retrieve configration
         key_id (string): authentication key identifier (numeric)
+        state (NtpState): OPTIONAL - output of get_ntp_state, fetched if omitted
 
     Returns:
         A dictionary of NTP authentication configuration parameters
     '''
-    auth_info = get_ntp_auth_key(device, key_id)
-    trusted_key_list = get_ntp_trusted_key(device)
-    auth_power = get_ntp_auth(device)
-
-    if key_id in trusted_key_list:
-        auth_info['trusted_key'] = 'true'
-    else:
-        auth_info['trusted_key'] = 'false'
-
-    if auth_power:
-        auth_info['authentication'] = 'on'
-    else:
-        auth_info['authentication'] = 'off'
+    if state is None:
+        state = get_ntp_state(device)
 
-    return auth_info
+    return state.auth_info(key_id)
 
 
-def get_ntp_options(device):
+def get_ntp_options(device, state=None):
     '''Returns the NTP optional parameters on a given device.
 
     Args:
         device (Device): NX-API enabled device from which to retrieve configration
+        state (NtpState): OPTIONAL - output of get_ntp_state, fetched if omitted
 
     Returns:
         A dictionary of NTP optional parameters
     '''
-    existing = {}
-    existing['logging'] = get_ntp_log(device)
-    existing['master'], existing['stratum'] = get_ntp_master(device)
+    if state is None:
+        state = get_ntp_state(device)
 
-    return existing
+    return state.options()
@@ -27,7 +27,11 @@ Ansible modules and in addition, general development.
 try:
     import xmltodict
     import re
+    from collections import OrderedDict
     from pycsco.nxos.error import CLIError
+    from pycsco.nxos.utils import filesystem
+    from pycsco.nxos.utils import parallel
+    from pycsco.nxos.utils.tables import Table, get_rows
 except ImportError as e:
     print '*' * 30
     print e
@@ -46,7 +50,11 @@ __all__ = ['cmd_list_to_string', 'create_dir', 'feature_enabled',
            'get_udld_global', 'get_udld_interface', 'get_vlan', 'get_vpc',
            'get_vpc_running_config', 'get_vrf_list', 'peer_link_exists',
            'interface_is_portchannel', 'is_default', 'is_interface_copper',
-           'delete_dir','interface_range_to_list']
+           'delete_dir','interface_range_to_list', 'get_command_bodies',
+           'iter_interface_details', 'get_portchannels', 'get_vpc_snapshot',
+           'get_vpc_peers_snapshot', 'get_hsrp_index',
+           'get_switchport_index', 'get_ipv4_index', 'get_vrf_inventory',
+           'get_commands_vrf_state', 'config_vrf_state']
 
 
 def get_vlan(device, vid):
@@ -126,38 +134,27 @@ def get_vlan_info(device):
     Returns:
         List of dicts of all VLANs on the switch
     """
-    command = 'show vlan brief'
-    xml = device.show(command)
-    data_dict = xmltodict.parse(xml[1])
-    vlan_list = []
-    try:
-        resource_table = data_dict['ins_api']['outputs']['output']['body'].get(
-            'TABLE_vlanbriefxbrief')['ROW_vlanbriefxbrief']
-        for each in resource_table:
-            temp = {}
-            temp['vlan_id'] = str(each.get('vlanshowbr-vlanid', None))
-            temp['name'] = str(each.get('vlanshowbr-vlanname', None))
-            temp['admin_state'] = str(each.get('vlanshowbr-shutstate', None))
-            temp['state'] = str(each.get('vlanshowbr-vlanstate', None))
-            if 'None' in str(each.get('vlanshowplist-ifidx', None)):
-                temp['interfaces'] = []
-            else:
-                temp['interfaces'] = interface_range_to_list(
-                    str(each.get('vlanshowplist-ifidx', None)))
-            vlan_list.append(temp)
-    except AttributeError:
-        # If only vlan 1 in device NXAPI returns dict instead of list
-        temp = {'vlan_id': str(resource_table.get('vlanshowbr-vlanid', None)),
-                'name': str(resource_table.get('vlanshowbr-vlanname', None)),
-                'admin_state': str(resource_table.get('vlanshowbr-shutstate', None)),
-                'state': str(resource_table.get('vlanshowbr-vlanstate', None))}
-        if 'None' in str(resource_table.get('vlanshowplist-ifidx', None)):
-            temp['interfaces'] = []
-        else:
-            temp['interfaces'] = interface_range_to_list(
-                str(resource_table.get('vlanshowplist-ifidx', None)))
-        vlan_list.append(temp)
-    return vlan_list
+    body = get_command_bodies(device, ['show vlan brief'])[0]
+    return _vlan_info_from_body(body)
+
+
+def _vlan_interfaces(value):
+    if 'None' in str(value):
+        return []
+    return interface_range_to_list(str(value))
+
+
+VLAN_BRIEF = Table('TABLE_vlanbriefxbrief', 'ROW_vlanbriefxbrief', [
+    ('vlan_id', 'vlanshowbr-vlanid'),
+    ('name', 'vlanshowbr-vlanname'),
+    ('admin_state', 'vlanshowbr-shutstate'),
+    ('state', 'vlanshowbr-vlanstate'),
+    ('interfaces', 'vlanshowplist-ifidx', _vlan_interfaces),
+])
+
+
+def _vlan_info_from_body(body):
+    return VLAN_BRIEF.extract(body)
 
 def interface_range_to_list(interfaces):
     """Converts single interface or range of interfaces into a list
@@ -694,7 +691,7 @@ def remove_interface(device, interface):
     return commands
 
 
-def get_ipv4_interface(device, intf):
+def get_ipv4_interface(device, intf, index=None):
     """Gets IPv4 interface config for existing Layer 3 interfaces
 
     Args:
@@ -702,12 +699,21 @@ def get_ipv4_interface(device, intf):
             using the Device class within device.py
         intf (string): full name of logical interface, i.e. vla10,
             loopback10, port-channel20
+        index (dict): OPTIONAL - output of get_ipv4_index to use instead
+            of querying the device
 
     Returns:
       dictionary: returns params/values of an existing L3 interface,
           i.e. IP, mask, VRF, etc.
 
     """
+    if index is not None:
+        interface = dict(index.get(_normalize_interface(intf)) or
+                          _ipv4_entry(intf, {}, None))
+        interface.pop('secondary', None)
+        interface['interface'] = intf
+        return interface
+
     command = 'show ip interface ' + intf
     interface = {}
     get_data = {}
@@ -734,6 +740,51 @@ def get_ipv4_interface(device, intf):
     return interface
 
 
+def _ipv4_entry(name, row, vrf):
+    return {
+        'interface': name,
+        'type': get_interface_type(name),
+        'ip_addr': str(row.get('prefix', None)),
+        'mask': str(row.get('masklen', None)),
+        'subnet': str(row.get('subnet', None)),
+        'vrf': str(vrf or 'default'),
+        'secondary': ['{0}/{1}'.format(each.get('prefix1'),
+                                       each.get('masklen1'))
+                      for each in get_rows(row, 'TABLE_secondary_address',
+                                           'ROW_secondary_address')],
+    }
+
+
+def get_ipv4_index(device):
+    """Gets the IPv4 config of every L3 interface in every VRF with a
+    single 'show ip interface vrf all'
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+
+    Returns:
+        OrderedDict: lower case interface name (port-channel and ethernet
+            spelled out) -> dict as returned by get_ipv4_interface plus
+            ``secondary``, a list of 'address/masklen' strings
+
+    """
+    body = get_command_bodies(device, ['show ip interface vrf all'])[0]
+
+    # TABLE_intf and TABLE_vrf are siblings, the n-th ROW_vrf is the
+    # vrf of the n-th ROW_intf
+    vrf_rows = get_rows(body, 'TABLE_vrf', 'ROW_vrf')
+    index = OrderedDict()
+    for position, row in enumerate(get_rows(body, 'TABLE_intf', 'ROW_intf')):
+        vrf = None
+        if position < len(vrf_rows):
+            vrf = vrf_rows[position].get('vrf-name-out')
+        name = str(row.get('intf-name'))
+        index[_normalize_interface(name)] = _ipv4_entry(name, row, vrf)
+
+    return index
+
+
 def get_config_ipv4_commands(delta, interface, existing):
     """Returns list of commands to be configured on a Layer 3 interface
 
@@ -792,7 +843,7 @@ def get_remove_ipv4_config_commands(existing, interface):
     return commands
 
 
-def get_interface_mode(device, interface):
+def get_interface_mode(device, interface, index=None):
     """Gets current mode of interface: layer2 or layer3
 
     Args:
@@ -800,11 +851,17 @@ def get_interface_mode(device, interface):
             using the Device class within device.py
         interface (string): full name of interface, i.e. Ethernet1/1,
             loopback10, port-channel20, vlan20
+        index (dict): OPTIONAL - output of get_switchport_index to use
+            instead of querying the device
 
     Returns:
         str: 'layer2' or 'layer3'
 
     """
+    if index is not None:
+        entry = index.get(_normalize_interface(interface))
+        return entry['mode'] if entry else 'unknown'
+
     command = 'show interface ' + interface
     intf_type = get_interface_type(interface)
     interface = {}
@@ -826,18 +883,24 @@ def get_interface_mode(device, interface):
     return mode
 
 
-def interface_is_portchannel(device, interface):
+def interface_is_portchannel(device, interface, index=None):
     """Checks to see if an interface is part of portchannel bundle
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
         interface (str): full name of interface, i.e. Ethernet1/1
+        index (dict): OPTIONAL - output of get_switchport_index to use
+            instead of querying the device
 
     Returns:
         True/False based on if interface is a member of a portchannel bundle
 
     """
+    if index is not None:
+        entry = index.get(_normalize_interface(interface))
+        return entry['portchannel'] if entry else False
+
     intf_type = get_interface_type(interface)
     if intf_type == 'ethernet':
         command = 'show interface ' + interface
@@ -858,18 +921,23 @@ def interface_is_portchannel(device, interface):
     return False
 
 
-def get_switchport(device, port):
+def get_switchport(device, port, index=None):
     """Gets current config of L2 switchport
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
         port (str): full name of interface, i.e. Ethernet1/1
+        index (dict): OPTIONAL - output of get_switchport_index to use
+            instead of querying the device
 
     Returns:
         dictionary with k/v pairs for L2 vlan config
 
     """
+    if index is not None:
+        entry = index.get(_normalize_interface(port))
+        return dict(entry['switchport']) if entry else {}
 
     command = 'show interface {0} switchport'.format(port)
     # The command being used here is 'show interface switcport'
@@ -899,6 +967,75 @@ def get_switchport(device, port):
     return switchport
 
 
+SWITCHPORT = Table('TABLE_interface', 'ROW_interface', [
+    ('interface', 'interface'),
+    ('mode', 'oper_mode'),
+    ('switchport', 'switchport'),
+    ('access_vlan', 'access_vlan'),
+    ('access_vlan_name', 'access_vlan_name'),
+    ('native_vlan', 'native_vlan'),
+    ('native_vlan_name', 'native_vlan_name'),
+    ('trunk_vlans', 'trunk_vlans'),
+])
+
+SWITCHPORT_COMMANDS = ['show interface switchport', 'show interface brief']
+
+
+def _layer_from_mode(intf_type, eth_mode):
+    if intf_type in ['ethernet', 'portchannel']:
+        mode = str(eth_mode or 'layer3')
+        if mode == 'access' or mode == 'trunk':
+            mode = 'layer2'
+        return mode
+    elif intf_type == 'loopback' or intf_type == 'svi':
+        return 'layer3'
+    return 'unknown'
+
+
+def get_switchport_index(device):
+    """Gets the L2 config, mode and port-channel membership of every
+    interface with a single request
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+
+    Returns:
+        dict: lower case interface name (port-channel and ethernet spelled
+            out) -> dict with ``interface``, ``mode`` (as returned by
+            get_interface_mode), ``portchannel`` (as returned by
+            interface_is_portchannel) and ``switchport`` (as returned by
+            get_switchport, {} for routed interfaces)
+
+    """
+    switchport_body, brief_body = get_command_bodies(
+        device, SWITCHPORT_COMMANDS)
+
+    index = {}
+    for row in get_rows(brief_body, 'TABLE_interface', 'ROW_interface'):
+        name = str(row.get('interface'))
+        intf_type = get_interface_type(name)
+        bundle = row.get('portchan')
+        index[_normalize_interface(name)] = {
+            'interface': name,
+            'mode': _layer_from_mode(intf_type, row.get('portmode')),
+            'portchannel': (intf_type == 'ethernet' and bool(bundle) and
+                            bundle != '--'),
+            'switchport': {},
+        }
+
+    for switchport in SWITCHPORT.extract(switchport_body):
+        key = _normalize_interface(switchport['interface'])
+        entry = index.get(key)
+        if entry is None:
+            entry = index[key] = {
+                'interface': switchport['interface'], 'mode': 'unknown',
+                'portchannel': False}
+        entry['switchport'] = switchport
+
+    return index
+
+
 def get_switchport_config_commands(device, switchport, port):
     """Gets commands required to config a given switchport interface
 
@@ -1051,16 +1188,11 @@ def get_min_links(device, group):
 
     """
     command = 'show run interface port-channel' + group
-    minlinks = None
     data = device.show(command, text=True)
     data_dict = xmltodict.parse(data[1])
-    ml_data = data_dict['ins_api']['outputs']['output']['body']
-    ml_list = ml_data.split('\n')
-    for line in ml_list:
-        this_line = line.strip()
-        if 'min-links' in this_line:
-            minlinks = this_line.split('min-links ')[-1]
-    return minlinks
+    ml_data = data_dict['ins_api']['outputs']['output']['body'] or ''
+    return _min_links_from_config(
+        [line.strip() for line in ml_data.split('\n')])
 
 
 def get_portchannel_members(pchannel):
@@ -1111,54 +1243,141 @@ def get_portchannel(device, group):
     except (KeyError, AttributeError, CLIError):
         pchannel = {}
 
-    member_dictionary = {}
     if pchannel:
-        portchannel['group'] = str(pchannel['group'])
-        # LACP or None (it is None when no interfaces are in PC or
-        # mode set to ON)
-        proto = str(pchannel['prtcl'])
-        members_list_of_dict = get_portchannel_members(pchannel)
-        members = []
-        # try/except needed bc it's a list of dicts if there is more than 1
-        # if there isn't, it's just a single dict
-        # This is common for NX-API
-        try:
-            for each in members_list_of_dict:
-                interface = str(each['port'])
-                members.append(interface)
+        portchannel = _portchannel_from_row(
+            pchannel,
+            lambda interface, proto: get_portchannel_mode(
+                device, interface, proto),
+            lambda: get_min_links(device, group))
 
-                temp = {}
-                temp['status'] = str(each['port-status'])
-                temp['mode'] = get_portchannel_mode(device, interface, proto)
+    return portchannel
 
-                member_dictionary[interface] = temp
 
-        except TypeError:
-            interface = str(members_list_of_dict['port'])
-            members.append(interface)
-            temp = {}
-            temp['status'] = str(members_list_of_dict['port-status'])
-            temp['mode'] = get_portchannel_mode(device, interface, proto)
-
-            member_dictionary[interface] = temp
-
-        # Each member should have the same mode
-        # This is just to verify that.
-        modes = set()
-        for each, value in member_dictionary.iteritems():
-            modes.update([value['mode']])
-        if len(modes) == 1:
-            portchannel['mode'] = value['mode']
-        else:
-            portchannel['mode'] = 'unknown'
+def _portchannel_from_row(pchannel, get_mode, min_links):
+    portchannel = {}
+    member_dictionary = {}
+    portchannel['group'] = str(pchannel['group'])
+    # LACP or None (it is None when no interfaces are in PC or
+    # mode set to ON)
+    proto = str(pchannel['prtcl'])
+    members = []
+    for each in get_rows(pchannel, 'TABLE_member', 'ROW_member'):
+        interface = str(each['port'])
+        members.append(interface)
 
-        portchannel['members'] = members
-        portchannel['members_detail'] = member_dictionary
-        portchannel['min_links'] = str(get_min_links(device, group))
+        temp = {}
+        temp['status'] = str(each['port-status'])
+        temp['mode'] = get_mode(interface, proto)
+
+        member_dictionary[interface] = temp
+
+    # Each member should have the same mode
+    # This is just to verify that.
+    modes = set()
+    for each, value in member_dictionary.iteritems():
+        modes.update([value['mode']])
+    if len(modes) == 1:
+        portchannel['mode'] = value['mode']
+    else:
+        portchannel['mode'] = 'unknown'
+
+    portchannel['members'] = members
+    portchannel['members_detail'] = member_dictionary
+    portchannel['min_links'] = str(min_links())
 
     return portchannel
 
 
+def _normalize_interface(name):
+    name = name.strip().lower()
+    for short, full in (('eth', 'ethernet'), ('po', 'port-channel')):
+        if name.startswith(short) and not name.startswith(full):
+            return full + name[len(short):]
+    return name
+
+
+def _running_config_interfaces(config):
+    """Splits running-config text into a dict of normalized interface
+    name -> list of stripped lines under it
+    """
+    blocks = {}
+    lines = None
+    for line in config.split('\n'):
+        if line.startswith('interface '):
+            lines = blocks.setdefault(
+                _normalize_interface(line[len('interface '):]), [])
+        elif lines is not None and line.startswith(' '):
+            lines.append(line.strip())
+        elif line.strip():
+            lines = None
+    return blocks
+
+
+def _mode_from_config(lines, proto):
+    if proto != 'LACP':
+        return 'on'
+    mode = 'Unknown'
+    find = ''
+    for line in lines:
+        if line.startswith('channel-group'):
+            find = line
+    if 'mode' in find:
+        if 'passive' in find:
+            mode = 'passive'
+        elif 'active' in find:
+            mode = 'active'
+    return mode
+
+
+def _min_links_from_config(lines):
+    minlinks = None
+    for line in lines:
+        if 'min-links' in line:
+            minlinks = line.split('min-links ')[-1]
+    return minlinks
+
+
+def get_portchannels(device):
+    """Gets existing config state of every portchannel
+
+    Note:
+        Uses two requests in total, 'show port-channel summary' and
+        'show running-config interface', however many port-channels
+        and members there are.
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+
+    Returns:
+      dict: group ID -> params/values of the portchannel, each as
+          returned by get_portchannel
+
+    """
+    try:
+        body = get_command_bodies(device, ['show port-channel summary'])[0]
+    except CLIError:
+        return {}
+    rows = get_rows(body, 'TABLE_channel', 'ROW_channel')
+    if not rows:
+        return {}
+
+    config = get_command_bodies(
+        device, ['show running-config interface'], text=True)[0]
+    blocks = _running_config_interfaces(config or '')
+
+    portchannels = {}
+    for pchannel in rows:
+        group = str(pchannel['group'])
+        portchannels[group] = _portchannel_from_row(
+            pchannel,
+            lambda interface, proto: _mode_from_config(
+                blocks.get(_normalize_interface(interface), []), proto),
+            lambda: _min_links_from_config(
+                blocks.get('port-channel' + group, [])))
+    return portchannels
+
+
 def get_portchannel_mode(device, intf, proto):
     """Gets existing mode (on, active, passive) of physical interface
 
@@ -1172,27 +1391,14 @@ def get_portchannel_mode(device, intf, proto):
         str: 'on,' 'passive', 'active'
 
     """
-    if proto != 'LACP':
-        mode = 'on'
-    else:
+    lines = []
+    if proto == 'LACP':
         command = 'show run interface ' + intf
-        mode = 'Unknown'
-
         data = device.show(command, text=True)
         data_dict = xmltodict.parse(data[1])
-        mode_data = data_dict['ins_api']['outputs']['output']['body']
-
-        mode_list = mode_data.split('\n')
-        for line in mode_list:
-            this_line = line.strip()
-            if this_line.startswith('channel-group'):
-                find = this_line
-        if 'mode' in find:
-            if 'passive' in find:
-                mode = 'passive'
-            elif 'active' in find:
-                mode = 'active'
-    return mode
+        mode_data = data_dict['ins_api']['outputs']['output']['body'] or ''
+        lines = [line.strip() for line in mode_data.split('\n')]
+    return _mode_from_config(lines, proto)
 
 
 def get_portchannel_list(device):
@@ -1440,17 +1646,22 @@ def get_interface_running_config(device, interface):
     return final_list
 
 
-def get_vrf_list(device):
+def get_vrf_list(device, inventory=None):
     """Gets base configuration of a given VRF
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
+        inventory (dict): OPTIONAL - output of get_vrf_inventory to use
+            instead of querying the device
 
     Returns:
       dict: params are vrf (name), state, and description
 
     """
+    if inventory is not None:
+        return [name.lower() for name in inventory]
+
     command = 'show vrf all'
     vrf_table = None
 
@@ -1505,18 +1716,27 @@ def get_vrf_description(device, vrf):
     return description
 
 
-def get_vrf(device, vrf):
+def get_vrf(device, vrf, inventory=None):
     """Gets base configuration of a given VRF
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
         vrf (str): vrf name
+        inventory (dict): OPTIONAL - output of get_vrf_inventory to use
+            instead of querying the device
 
     Returns:
         dict: params are vrf (name), state, and description
 
     """
+    if inventory is not None:
+        entry = inventory.get(vrf)
+        if not entry:
+            return {}
+        return dict((key, entry[key])
+                    for key in ('vrf', 'admin_state', 'description'))
+
     command = 'show vrf ' + vrf
     vrf = {}
     get_data = None
@@ -1537,6 +1757,63 @@ def get_vrf(device, vrf):
     return vrf
 
 
+def _vrf_contexts(config):
+    """Parses the 'vrf context' blocks of running-config text into a dict
+    of vrf name -> dict of description, rd and vni
+    """
+    contexts = {}
+    context = None
+    for line in config.split('\n'):
+        if line.startswith('vrf context '):
+            context = contexts.setdefault(line.split()[2], {
+                'description': None, 'rd': None, 'vni': None})
+        elif context is not None and line.startswith(' '):
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == 'description':
+                context['description'] = line.split('description', 1)[1] \
+                    .strip()
+            elif words[0] in ('rd', 'vni') and len(words) > 1:
+                context[words[0]] = words[1]
+        elif line.strip():
+            context = None
+    return contexts
+
+
+def get_vrf_inventory(device):
+    """Gets every VRF with its state and config with two requests,
+    'show vrf all' structured and 'show run section vrf' as text
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+
+    Returns:
+        OrderedDict: vrf name -> dict with vrf (name), admin_state and
+            description as returned by get_vrf, plus rd and vni ('None'
+            when not configured)
+
+    """
+    body = get_command_bodies(device, ['show vrf all'])[0]
+    config = get_command_bodies(device, ['show run section vrf'],
+                                text=True)[0]
+    contexts = _vrf_contexts(config or '')
+
+    inventory = OrderedDict()
+    for row in get_rows(body, 'TABLE_vrf', 'ROW_vrf'):
+        name = str(row['vrf_name'])
+        context = contexts.get(name, {})
+        inventory[name] = {
+            'vrf': name,
+            'admin_state': str(row['vrf_state']).lower(),
+            'description': str(context.get('description')),
+            'rd': str(context.get('rd')),
+            'vni': str(context.get('vni')),
+        }
+    return inventory
+
+
 def get_commands_to_remove_vrf(vrf):
     """Gets commands to remove a VRF
        Note: Does not remove interface level configurations
@@ -1585,6 +1862,64 @@ def get_commands_to_config_vrf(delta, vrf):
     return commands
 
 
+def get_commands_vrf_state(desired, inventory):
+    """Gets the commands that bring many VRFs to a desired state
+
+    Args:
+        desired (dict): vrf name -> dict of admin_state and/or description,
+            or None to remove the vrf.  VRFs that aren't listed are left
+            alone.
+        inventory (dict): output of get_vrf_inventory
+
+    Returns:
+        list: list of lists of commands, one list per vrf, ready for
+            execute_commands
+
+    """
+    commands = []
+    for vrf, params in sorted(desired.iteritems()):
+        existing = inventory.get(vrf)
+        if params is None:
+            if existing:
+                commands.append(get_commands_to_remove_vrf(vrf))
+            continue
+        proposed = set((key, str(value).lower() if key == 'admin_state'
+                        else str(value))
+                       for key, value in params.iteritems()
+                       if value is not None)
+        current = set((key, existing[key]) for key in params
+                      if existing and key in existing)
+        delta = proposed.difference(current)
+        if existing is None and not delta:
+            commands.append(['vrf context ' + vrf])
+            continue
+        cmds = get_commands_to_config_vrf(delta, vrf)
+        if cmds:
+            commands.append(cmds)
+    return commands
+
+
+def config_vrf_state(device, desired, inventory=None):
+    """Brings many VRFs to a desired state with a single config request
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        desired (dict): see get_commands_vrf_state
+        inventory (dict): OPTIONAL - output of get_vrf_inventory, fetched
+            if omitted
+
+    Returns:
+        list: the commands that were sent, see get_commands_vrf_state
+
+    """
+    if inventory is None:
+        inventory = get_vrf_inventory(device)
+    commands = get_commands_vrf_state(desired, inventory)
+    execute_commands(device, commands)
+    return commands
+
+
 def get_commands_to_config_vpc(vpc, domain, existing):
     """Gets commands to configure a VPC global config params
 
@@ -1678,8 +2013,6 @@ def get_vpc(device):
         dict: k/v pairs of vpc config params
 
     """
-    vpc = {}
-
     # ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ###
     # Obtaining VPC domain ID and auto-recovery status
     command = 'show vpc'
@@ -1689,89 +2022,210 @@ def get_vpc(device):
         data_dict = xmltodict.parse(data[1])
         vpc_dict = data_dict['ins_api']['outputs']['output']['body']
     except KeyError:
-        domain = None
-        auto_recovery = None
-
-    if vpc_dict:
-        domain = str(vpc_dict['vpc-domain-id'])
-        auto_recovery = get_autorecovery(str(
-            vpc_dict['vpc-auto-recovery-status']))
-
-    if domain != 'not configured':
-
-        # ### ### ### ### ### ### ### ### ### ### ### ### ### ### ###
-        # Obtaining VPC system priority, role priority, delay restore,
-        # pkl_src, and peer_gw
-        delay_restore = None
-        pkl_src = None
-        role_priority = None
-        system_priority = None
-
-        run = get_vpc_running_config(device)
-        peer_gw = False
-        if run:
-            vpc_list = run.split('\n')
-            for each in vpc_list:
-                if 'delay restore' in each:
-                    my_line = each.split(' ')
-                    if len(my_line) == 5:
-                        value = my_line[-1]
-                        delay_restore = value
-                elif 'peer-keepalive destination' in each:
-                    my_line = each.split(' ')
-                    for word in my_line:
-                        if 'source' in word:
-                            index = my_line.index(word)
-                            pkl_src = my_line[index+1]
-                elif 'role priority' in each:
-                    my_line = each.split(' ')
-                    value = my_line[-1]
-                    role_priority = value
-                elif 'system-priority' in each:
-                    my_line = each.split(' ')
-                    value = my_line[-1]
-                    system_priority = value
-                elif 'peer-gateway' in each:
-                    peer_gw = True
+        pass
 
-        # # ### ### ### ### ### ### ### ### ### ### ### ### ### ### ###
-        # Obtaining pkl_dest and pkl_vrf
-        command = 'show vpc peer-keepalive'
-        try:
-            data = device.show(command)
-            data_dict = xmltodict.parse(data[1])
-            vpc_dict = data_dict['ins_api']['outputs']['output']['body']
-        except (KeyError, CLIError):
+    domain, auto_recovery = _vpc_domain(vpc_dict)
+    if domain == 'not configured':
+        return {}
+
+    run = get_vpc_running_config(device)
+
+    # # ### ### ### ### ### ### ### ### ### ### ### ### ### ### ###
+    # Obtaining pkl_dest and pkl_vrf
+    command = 'show vpc peer-keepalive'
+    pkl_dict = None
+    try:
+        data = device.show(command)
+        data_dict = xmltodict.parse(data[1])
+        pkl_dict = data_dict['ins_api']['outputs']['output']['body']
+    except (KeyError, CLIError):
+        pass
+
+    return _vpc_from_config(domain, auto_recovery, run, pkl_dict)
+
+
+def _vpc_domain(vpc_dict):
+    if not vpc_dict:
+        return None, None
+    domain = str(vpc_dict['vpc-domain-id'])
+    auto_recovery = get_autorecovery(str(
+        vpc_dict['vpc-auto-recovery-status']))
+    return domain, auto_recovery
+
+
+def _vpc_from_config(domain, auto_recovery, run, pkl_dict):
+    vpc = {}
+
+    # ### ### ### ### ### ### ### ### ### ### ### ### ### ### ###
+    # Obtaining VPC system priority, role priority, delay restore,
+    # pkl_src, and peer_gw
+    delay_restore = None
+    pkl_src = None
+    role_priority = None
+    system_priority = None
+
+    peer_gw = False
+    if run:
+        vpc_list = run.split('\n')
+        for each in vpc_list:
+            if 'delay restore' in each:
+                my_line = each.split(' ')
+                if len(my_line) == 5:
+                    value = my_line[-1]
+                    delay_restore = value
+            elif 'peer-keepalive destination' in each:
+                my_line = each.split(' ')
+                for word in my_line:
+                    if 'source' in word:
+                        index = my_line.index(word)
+                        pkl_src = my_line[index+1]
+            elif 'role priority' in each:
+                my_line = each.split(' ')
+                value = my_line[-1]
+                role_priority = value
+            elif 'system-priority' in each:
+                my_line = each.split(' ')
+                value = my_line[-1]
+                system_priority = value
+            elif 'peer-gateway' in each:
+                peer_gw = True
+
+    pkl_dest = None
+    pkl_vrf = None
+    if pkl_dict:
+        # WHY IS THIS RETURNING A LIST????
+        pkl_dest = pkl_dict['vpc-keepalive-dest']
+        if pkl_dest == 'N/A' or 'N/A' in pkl_dest:
             pkl_dest = None
-            pkl_vrf = None
-
-        if vpc_dict:
-            # WHY IS THIS RETURNING A LIST????
-            pkl_dest = vpc_dict['vpc-keepalive-dest']
-            if pkl_dest == 'N/A' or 'N/A' in pkl_dest:
-                pkl_dest = None
-            elif len(pkl_dest) == 2:
-                pkl_dest = pkl_dest[0]
-            pkl_vrf = str(vpc_dict['vpc-keepalive-vrf'])
-
-        # ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### #
-
-        vpc['domain'] = domain
-        vpc['auto_recovery'] = auto_recovery
-        vpc['delay_restore'] = delay_restore
-        vpc['pkl_src'] = pkl_src
-        vpc['role_priority'] = role_priority
-        vpc['system_priority'] = system_priority
-        vpc['pkl_dest'] = pkl_dest
-        vpc['pkl_vrf'] = pkl_vrf
-        vpc['peer_gw'] = peer_gw
-    else:
-        vpc = {}
+        elif len(pkl_dest) == 2:
+            pkl_dest = pkl_dest[0]
+        pkl_vrf = str(pkl_dict['vpc-keepalive-vrf'])
+
+    # ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### #
+
+    vpc['domain'] = domain
+    vpc['auto_recovery'] = auto_recovery
+    vpc['delay_restore'] = delay_restore
+    vpc['pkl_src'] = pkl_src
+    vpc['role_priority'] = role_priority
+    vpc['system_priority'] = system_priority
+    vpc['pkl_dest'] = pkl_dest
+    vpc['pkl_vrf'] = pkl_vrf
+    vpc['peer_gw'] = peer_gw
 
     return vpc
 
 
-def get_portchannel_vpc_config(device, portchannel):
+VPC_COMMANDS = ['show vpc', 'show vpc peer-keepalive', 'show vpc brief']
+
+
+def get_vpc_snapshot(device):
+    """Gets the complete vpc state of a switch
+
+    Note:
+        Uses two requests: one for 'show vpc', 'show vpc peer-keepalive'
+        and 'show vpc brief' and one for 'show running section vpc'.
+        If the device rejects the first, its commands are retried one
+        at a time.
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+
+    Returns:
+        dict: with the keys
+            vpc: as returned by get_vpc
+            peer_link: as returned by get_active_vpc_peer_link
+            peer_link_configured: as returned by peer_link_exists
+            mappings: as returned by get_existing_portchannel_to_vpc_mappings
+            portchannels: portchannel group -> vpc number or 'peer-link',
+                what get_portchannel_vpc_config returns for each group
+
+    """
+    try:
+        bodies = get_command_bodies(device, VPC_COMMANDS)
+    except CLIError:
+        bodies = []
+        for command in VPC_COMMANDS:
+            try:
+                bodies.append(get_command_bodies(device, [command])[0])
+            except CLIError:
+                bodies.append(None)
+    vpc_body, pkl_body, brief_body = bodies
+    run = get_vpc_running_config(device)
+
+    domain, auto_recovery = _vpc_domain(vpc_body)
+    if domain == 'not configured':
+        vpc = {}
+    else:
+        vpc = _vpc_from_config(domain, auto_recovery, run, pkl_body)
+
+    peer_link = None
+    rows = get_rows(brief_body, 'TABLE_peerlink', 'ROW_peerlink')
+    if rows and rows[0].get('peerlink-ifindex'):
+        peer_link = str(rows[0]['peerlink-ifindex'])
+
+    mappings = {}
+    for each in get_rows(brief_body, 'TABLE_vpc', 'ROW_vpc'):
+        mappings[str(each['vpc-id'])] = str(each['vpc-ifindex'])
+
+    portchannels = {}
+    for vpc_id, port_channel in mappings.iteritems():
+        portchannels[str(port_channel[2:])] = vpc_id
+    if peer_link:
+        portchannels[peer_link[2:]] = 'peer-link'
+
+    return {
+        'vpc': vpc,
+        'peer_link': peer_link,
+        'peer_link_configured': bool(run) and 'peer-link' in run,
+        'mappings': mappings,
+        'portchannels': portchannels,
+    }
+
+
+def get_vpc_peers_snapshot(device, peer):
+    """Gets the vpc state of both vpc peers at the same time
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        peer (Device): the vpc peer of ``device``
+
+    Returns:
+        dict: with the keys
+            local, peer: as returned by get_vpc_snapshot
+            domain_match: true if both report the same vpc domain
+            vpcs: vpc number -> {'local': portchannel, 'peer': portchannel},
+                None on the side where the vpc isn't configured
+            mismatched: sorted vpc numbers configured on only one peer
+
+    """
+    snapshots = {}
+    for each, snapshot, error in parallel.iter_results(
+            get_vpc_snapshot, [device, peer], 2):
+        if error is not None:
+            raise error
+        snapshots[each is peer] = snapshot
+    local, remote = snapshots[False], snapshots[True]
+
+    vpcs = {}
+    for vpc_id in set(local['mappings']) | set(remote['mappings']):
+        vpcs[vpc_id] = {'local': local['mappings'].get(vpc_id),
+                        'peer': remote['mappings'].get(vpc_id)}
+
+    return {
+        'local': local,
+        'peer': remote,
+        'domain_match': local['vpc'].get('domain') ==
+        remote['vpc'].get('domain'),
+        'vpcs': vpcs,
+        'mismatched': sorted(vpc_id for vpc_id, ends in vpcs.iteritems()
+                             if None in ends.values()),
+    }
+
+
+def get_portchannel_vpc_config(device, portchannel, snapshot=None):
     """Gets vpc config from network switch
 
     Args:
@@ -1779,12 +2233,17 @@ def get_portchannel_vpc_config(device, portchannel):
             using the Device class within device.py
         portchannel (str): group number of the portchannel, i.e. 10, 20, etc.
             NOT including "port-channel"
+        snapshot (dict): OPTIONAL - result of get_vpc_snapshot to answer
+            from instead of querying the device
 
     Returns:
         str: vpc group number that exists on that given portchannel
             or 'peer-link', if the portchannel is the peer-link
 
     """
+    if snapshot is not None:
+        return snapshot['portchannels'].get(portchannel)
+
     command = 'show vpc brief'
 
     peer_link_pc = None
@@ -1856,17 +2315,22 @@ def get_commands_to_config_vpc_interface(portchannel, config_value):
     return commands
 
 
-def get_active_vpc_peer_link(device):
+def get_active_vpc_peer_link(device, snapshot=None):
     """Gets portchannel that is the active peerlink
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
+        snapshot (dict): OPTIONAL - result of get_vpc_snapshot to answer
+            from instead of querying the device
 
     Returns:
         str: port-channel interface that is the active peerlink
 
     """
+    if snapshot is not None:
+        return snapshot['peer_link']
+
     command = 'show vpc brief'
     try:
         data = device.show(command)
@@ -1879,17 +2343,22 @@ def get_active_vpc_peer_link(device):
     return peer_link
 
 
-def get_existing_portchannel_to_vpc_mappings(device):
+def get_existing_portchannel_to_vpc_mappings(device, snapshot=None):
     """Gets mapping for vpc to portchannels
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
+        snapshot (dict): OPTIONAL - result of get_vpc_snapshot to answer
+            from instead of querying the device
 
     Returns:
         dict: k/v pairs in the form of vpc/pc
 
     """
+    if snapshot is not None:
+        return dict(snapshot['mappings'])
+
     command = 'show vpc brief'
     try:
         data = device.show(command)
@@ -2015,17 +2484,22 @@ def get_commands_to_remove_vpc(domain):
     return commands
 
 
-def peer_link_exists(device):
+def peer_link_exists(device, snapshot=None):
     """Checks to see if vpc peer link exists
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
+        snapshot (dict): OPTIONAL - result of get_vpc_snapshot to answer
+            from instead of querying the device
 
     Returns:
         bool: true if peer link exists, else false
 
     """
+    if snapshot is not None:
+        return snapshot['peer_link_configured']
+
     found = False
     run = get_vpc_running_config(device)
     if run:
@@ -2036,38 +2510,76 @@ def peer_link_exists(device):
     return found
 
 
-def get_hsrp_groups_on_interfaces(device):
+def _hsrp_version(value):
+    version = str(value)
+    if version[-1:] in ('1', '2'):
+        return version[-1]
+    return version
+
+
+HSRP_GROUP = Table('TABLE_grp_detail', 'ROW_grp_detail', [
+    ('interface', 'sh_if_index', lambda value: str(value).lower()),
+    ('group', 'sh_group_num'),
+    ('version', 'sh_group_version', _hsrp_version),
+    ('priority', 'sh_cfg_prio'),
+    ('preempt', 'sh_preempt'),
+    ('vip', 'sh_vip'),
+    ('auth_type', 'sh_authentication_type'),
+    ('auth_string', 'sh_authentication_data'),
+])
+
+
+def _hsrp_index_from_command(device, command):
+    try:
+        body = get_command_bodies(device, [command])[0]
+    except CLIError:
+        # hsrp not enabled or no such group
+        return {}
+    index = OrderedDict()
+    for each in HSRP_GROUP.extract(body):
+        index[(each['interface'], each['group'])] = each
+    return index
+
+
+def get_hsrp_index(device):
+    """Gets every hsrp group of a device with a single 'show hsrp all'
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+
+    Returns:
+        OrderedDict: (interface, group) -> dict of the group's config
+            params as returned by get_hsrp_group, in the device's order.
+            Interface names are lower case.
+
+    """
+    return _hsrp_index_from_command(device, 'show hsrp all')
+
+
+def get_hsrp_groups_on_interfaces(device, index=None):
     """Gets hsrp groups configured on each interface
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
+        index (dict): OPTIONAL - output of get_hsrp_index to use instead
+            of querying the device
 
     Returns:
         dict: k/v pairs in the form of interface/[group list]
 
     """
-    command = 'show hsrp all'
-    xmlReturnData = device.show(command)
-    result = xmltodict.parse(xmlReturnData[1])
+    if index is None:
+        index = get_hsrp_index(device)
     hsrp = {}
-    try:
-        get_data = result['ins_api']['outputs']['output']['body'].get(
-            'TABLE_grp_detail')['ROW_grp_detail']
-        for entry in get_data:
-            interface = str(entry['sh_if_index'].lower())
-            value = hsrp.get(interface, 'new')
-            if value == 'new':
-                hsrp[interface] = []
-            group = str(entry['sh_group_num'])
-            hsrp[interface].append(group)
-    except (KeyError, AttributeError, CLIError):
-        hsrp = {}
+    for interface, group in index:
+        hsrp.setdefault(interface, []).append(group)
 
     return hsrp
 
 
-def get_hsrp_group(device, group, interface_param):
+def get_hsrp_group(device, group, interface_param, index=None):
     """Gets hsrp config for a given interface and group
 
     Args:
@@ -2075,65 +2587,16 @@ def get_hsrp_group(device, group, interface_param):
             using the Device class within device.py
         group (str): hsrp group
         interface_param (str): name of interface
+        index (dict): OPTIONAL - output of get_hsrp_index to use instead
+            of querying the device
 
     Returns:
         dict: config params for a given hsrp group on a given interface
 
     """
-    command = 'show hsrp group ' + group
-    xmlReturnData = device.show(command)
-    result = xmltodict.parse(xmlReturnData[1])
-    hsrp = []
-    try:
-        get_data = result['ins_api']['outputs']['output']['body'].get(
-            'TABLE_grp_detail')['ROW_grp_detail']
-        for hsrp_group in get_data:
-            interface = str(hsrp_group['sh_if_index'].lower())
-            group = str(hsrp_group['sh_group_num'])
-            hsrp_version = str(hsrp_group['sh_group_version'])
-            if hsrp_version[-1] == '1':
-                version = '1'
-            elif hsrp_version[-1] == '2':
-                version = '2'
-            priority = str(hsrp_group['sh_cfg_prio'])
-            preempt = str(hsrp_group['sh_preempt'])
-            vip = str(hsrp_group['sh_vip'])
-            auth_type = str(hsrp_group.get('sh_authentication_type', None))
-            auth_string = str(hsrp_group.get('sh_authentication_data', None))
-            # secure = str(get_data.get('sh_keystring_attr','unencrypted'))
-            temp = dict(interface=interface, group=group, version=version,
-                        priority=priority, preempt=preempt, vip=vip,
-                        auth_type=auth_type, auth_string=auth_string)
-
-            hsrp.append(temp)
-
-    except (TypeError, AttributeError, CLIError):
-        try:
-            interface = str(get_data['sh_if_index'].lower())
-            group = str(get_data['sh_group_num'])
-            hsrp_version = str(get_data['sh_group_version'])
-            if hsrp_version[-1] == '1':
-                version = '1'
-            elif hsrp_version[-1] == '2':
-                version = '2'
-            priority = str(get_data['sh_cfg_prio'])
-            preempt = str(get_data['sh_preempt'])
-            vip = str(get_data['sh_vip'])
-            auth_type = str(get_data.get('sh_authentication_type', None))
-            auth_string = str(get_data.get('sh_authentication_data', None))
-            # secure = str(get_data.get('sh_keystring_attr','unencrypted'))
-            temp = dict(interface=interface, group=group, version=version,
-                        priority=priority, preempt=preempt, vip=vip,
-                        auth_type=auth_type, auth_string=auth_string)
-            hsrp.append(temp)
-        except:
-            hsrp = []
-
-    if hsrp:
-        for each in hsrp:
-            if interface_param == each['interface']:
-                return each
-    return {}
+    if index is None:
+        index = _hsrp_index_from_command(device, 'show hsrp group ' + group)
+    return index.get((interface_param, str(group)), {})
 
 
 def get_commands_remove_hsrp(group, interface):
@@ -2245,6 +2708,29 @@ def cmd_list_to_string(cmds):
     command = ' ; '.join(cmds)
     return command + ' ;'
 
+
+def get_command_bodies(device, commands, text=False):
+    """Runs several show commands in a single NX-API request
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        commands (list): ordered list of show commands
+        text (bool): OPTIONAL - request text instead of structured output
+
+    Returns:
+        list: body of each command's output, in the order of ``commands``
+
+    Raises:
+        CLIError: if any of the commands is rejected
+
+    """
+    data = device.show(' ; '.join(commands), text=text)
+    outputs = xmltodict.parse(data[1])['ins_api']['outputs']['output']
+    if not isinstance(outputs, list):
+        outputs = [outputs]
+    return [each.get('body') for each in outputs]
+
 def nested_cmd_list_to_string(commands):
     cmds = ''
     if commands:
@@ -2293,222 +2779,157 @@ def get_neighbors(device, neigh_type='cdp'):
         list: ordered list of dicts (dict per neigh)
 
     """
+    if neigh_type not in NEIGHBOR_COMMANDS:
+        return []
+    body = get_command_bodies(device, [NEIGHBOR_COMMANDS[neigh_type]])[0]
+    return _neighbors_from_body(body, neigh_type)
 
-    def clean(name):
-        if '(' in name and ')' in name:
-            return name.split('(')[0]
-        else:
-            return name
 
-    neighbors = []
+NEIGHBOR_COMMANDS = {'cdp': 'show cdp neighbors',
+                     'lldp': 'show lldp neighbors'}
 
-    if neigh_type == 'cdp':
-        command = 'show cdp neighbors'
-        xmlReturnData = device.show(command)
-        result = xmltodict.parse(xmlReturnData[1])
-        cdp_table = result['ins_api']['outputs']['output']['body'].get(
-            'TABLE_cdp_neighbor_brief_info')['ROW_cdp_neighbor_brief_info']
-        try:
-            for each in cdp_table:
-                temp = {}
-                local_intf = str(each['intf_id'])
-                remote_hostname = clean(str(each['device_id'].split('.')[0]))
-                remote_device_type = str(each['platform_id'])
-                remote_intf = str(each['port_id'])
-                temp = {'platform': remote_device_type,
-                        'neighbor': remote_hostname,
-                        'neighbor_interface': remote_intf,
-                        'local_interface': local_intf}
-                neighbors.append(temp)
 
-        except TypeError:
-            # only used if there is only one neighbor on a device
-            temp = {}
-            local_intf = str(cdp_table['intf_id'])
-            remote_hostname = str(cdp_table['device_id'].split('.')[0])
-            remote_device_type = str(cdp_table['platform_id'])
-            remote_intf = str(cdp_table['port_id'])
-            temp = {'platform': remote_device_type,
-                    'neighbor': remote_hostname,
-                    'neighbor_interface': remote_intf,
-                    'local_interface': local_intf}
-            neighbors.append(temp)
-
-    elif neigh_type == 'lldp':
-        command = 'show lldp neighbors'
-        xmlReturnData = device.show(command)
-        result = xmltodict.parse(xmlReturnData[1])
-        lldp_table = result['ins_api']['outputs']['output']['body'].get(
-            'TABLE_nbor')['ROW_nbor']
-        try:
-            for each in lldp_table:
-                temp = {}
-                local_intf = str(each['l_port_id'])
-                remote_hostname = str(each['chassis_id'].split('.')[0])
-                remote_intf = str(each['port_id'])
-                temp = {'neighbor': remote_hostname,
-                        'neighbor_interface': remote_intf,
-                        'local_interface': local_intf}
-                neighbors.append(temp)
+def _cdp_name(value):
+    name = str(value).split('.')[0]
+    if '(' in name and ')' in name:
+        return name.split('(')[0]
+    return name
 
-        except TypeError:
-            # only used if there is only one neighbor on a device
-            temp = {}
-            local_intf = str(lldp_table['l_port_id'])
-            remote_hostname = str(lldp_table['chassis_id'].split('.')[0])
-            remote_intf = str(lldp_table['port_id'])
-            temp = {'neighbor': remote_hostname,
-                    'neighbor_interface': remote_intf,
-                    'local_interface': local_intf}
-            neighbors.append(temp)
 
-    return neighbors
+def _lldp_name(value):
+    return str(value).split('.')[0]
+
+
+NEIGHBOR_TABLES = {
+    'cdp': Table(
+        'TABLE_cdp_neighbor_brief_info', 'ROW_cdp_neighbor_brief_info', [
+            ('platform', 'platform_id'),
+            ('neighbor', 'device_id', _cdp_name),
+            ('neighbor_interface', 'port_id'),
+            ('local_interface', 'intf_id'),
+        ]),
+    'lldp': Table('TABLE_nbor', 'ROW_nbor', [
+        ('neighbor', 'chassis_id', _lldp_name),
+        ('neighbor_interface', 'port_id'),
+        ('local_interface', 'l_port_id'),
+    ]),
+}
+
 
+def _neighbors_from_body(body, neigh_type):
+    return NEIGHBOR_TABLES[neigh_type].extract(body)
 
-def get_facts(device):
+
+FACTS_COMMANDS = ['show version', 'show interface status', 'show module',
+                  'show environment', 'show vlan brief']
+
+
+def get_facts(device, lazy=False):
     """Gets facts about the network device
 
+    Note:
+        All commands are sent in one request.  If the device rejects
+        any of them, they are run one at a time instead.
+
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
+        lazy (bool): OPTIONAL - rows of interfaces_detail, modules,
+            power_supply_info, fan_info and vlan_list are LazyRecord
+            objects that convert fields as they are read
 
     Returns:
         dict: all facts about device
 
     """
-    command = 'show version'
-    xml = device.show(command)
-    result = xmltodict.parse(xml[1])
+    bodies = _get_facts_bodies(device, FACTS_COMMANDS)
+    return _facts_from_bodies(*bodies, lazy=lazy)
 
-    resource_table = result['ins_api']['outputs']['output']['body']
-    os = resource_table.get('rr_sys_ver', None)
-    kickstart = resource_table.get('kickstart_ver_str', None)
-    platform = resource_table.get('chassis_id', None)
-    hostname = resource_table.get('host_name', None)
-    rr = resource_table.get('rr_reason', None)
 
-
-    command = 'show interface status'
+def _get_facts_bodies(device, commands):
     try:
-        xml = device.show(command)
-        result = xmltodict.parse(xml[1])
-        resource_table = result['ins_api']['outputs']['output']['body'].get(
-            'TABLE_interface')['ROW_interface']
-        interface_list = []
-        detailed_list = []
-        for each in resource_table:
-            intf = str(each.get('interface', None))
-            if intf:
-                temp = {}
-                interface_list.append(intf)
-                temp['interface'] = intf
-                temp['description'] = str(each.get('name', None))
-                temp['state'] = str(each.get('state', None))
-                temp['vlan'] = str(each.get('vlan', None))
-                temp['duplex'] = str(each.get('duplex', None))
-                temp['speed'] = str(each.get('speed', None))
-                temp['type'] = str(each.get('type', None))
-                detailed_list.append(temp)
+        return get_command_bodies(device, commands)
     except CLIError:
-        # added this in to support NXOSv
-        detailed_list = []
-        interface_list = []
-
-    command = 'show module'
-    xml = device.show(command)
-    result = xmltodict.parse(xml[1])
-
-    resource_table = result['ins_api']['outputs']['output']['body'].get(
-        'TABLE_modinfo')['ROW_modinfo']
-    mod_list = []
-    try:
-        for each in resource_table:
-            temp = {}
-            temp['ports'] = str(each.get('ports', None))
-            temp['type'] = str(each.get('modtype', None))
-            temp['model'] = str(each.get('model', None))
-            temp['status'] = str(each.get('status', None))
-            mod_list.append(temp)
-    except (AttributeError, TypeError):
-        temp = {}
-        temp['ports'] = str(resource_table.get('ports', None))
-        temp['type'] = str(resource_table.get('modtype', None))
-        temp['model'] = str(resource_table.get('model', None))
-        temp['status'] = str(resource_table.get('status', None))
-        mod_list.append(temp)
-
-    command = 'show environment'
-    xml = device.show(command)
-    result = xmltodict.parse(xml[1])
-
-    resource_table = result['ins_api']['outputs']['output']['body']
-    power_supply_list = []
-    try:
-        for each in resource_table['powersup']['TABLE_psinfo']['ROW_psinfo']:
-            temp = {}
-            temp['number'] = str(each.get('psnum', None))
-            temp['model'] = str(each.get('psmodel', None))
-            temp['actual_output'] = str(each.get('actual_out', None))
-            temp['actual_input'] = str(each.get('actual_in', None))
-            temp['total_capacity'] = str(each.get('tot_capa', None))
-            temp['status'] = str(each.get('ps_status', None))
-            power_supply_list.append(temp)
-    except (AttributeError, TypeError):
-        temp = {}
-        each = resource_table['powersup']['TABLE_psinfo']['ROW_psinfo']
-        temp['number'] = str(each.get('psnum', None))
-        temp['model'] = str(each.get('psmodel', None))
-        temp['actual_output'] = str(each.get('actual_out', None))
-        temp['actual_input'] = str(each.get('actual_in', None))
-        temp['total_capacity'] = str(each.get('tot_capa', None))
-        temp['status'] = str(each.get('ps_status', None))
-        power_supply_list.append(temp)
-
-    fan_list = []
-    try:
-        for each in resource_table['fandetails'].get(
-                'TABLE_faninfo')['ROW_faninfo']:
-            temp = {}
-            temp['name'] = str(each.get('fanname', None))
-            temp['model'] = str(each.get('fanmodel', None))
-            temp['hw_ver'] = str(each.get('fanhwver', None))
-            temp['direction'] = str(each.get('fandir', None))
-            temp['status'] = str(each.get('fanstatus', None))
-            fan_list.append(temp)
-    except (AttributeError, TypeError):
-        temp = {}
-        each = resource_table['fandetails']['TABLE_faninfo']['ROW_faninfo']
-        temp['name'] = str(each.get('fanname', None))
-        temp['model'] = str(each.get('fanmodel', None))
-        temp['hw_ver'] = str(each.get('fanhwver', None))
-        temp['direction'] = str(each.get('fandir', None))
-        temp['status'] = str(each.get('fanstatus', None))
-        fan_list.append(temp)
+        bodies = []
+        for command in commands:
+            try:
+                bodies.append(get_command_bodies(device, [command])[0])
+            except CLIError:
+                if command != 'show interface status':
+                    raise
+                # added this in to support NXOSv
+                bodies.append(None)
+        return bodies
+
+
+INTERFACE_STATUS = Table('TABLE_interface', 'ROW_interface', [
+    ('interface', 'interface'),
+    ('description', 'name'),
+    ('state', 'state'),
+    ('vlan', 'vlan'),
+    ('duplex', 'duplex'),
+    ('speed', 'speed'),
+    ('type', 'type'),
+])
+
+MODULES = Table('TABLE_modinfo', 'ROW_modinfo', [
+    ('ports', 'ports'),
+    ('type', 'modtype'),
+    ('model', 'model'),
+    ('status', 'status'),
+])
+
+POWER_SUPPLIES = Table(('powersup', 'TABLE_psinfo'), 'ROW_psinfo', [
+    ('number', 'psnum'),
+    ('model', 'psmodel'),
+    ('actual_output', 'actual_out'),
+    ('actual_input', 'actual_in'),
+    ('total_capacity', 'tot_capa'),
+    ('status', 'ps_status'),
+])
+
+FANS = Table(('fandetails', 'TABLE_faninfo'), 'ROW_faninfo', [
+    ('name', 'fanname'),
+    ('model', 'fanmodel'),
+    ('hw_ver', 'fanhwver'),
+    ('direction', 'fandir'),
+    ('status', 'fanstatus'),
+])
+
+
+def _facts_from_bodies(version, interface_status, module, environment,
+                       vlan_brief, lazy=False):
+    extract = 'lazy' if lazy else 'extract'
+    detailed_list = []
+    if interface_status is not None:
+        detailed_list = getattr(INTERFACE_STATUS, extract)(interface_status)
 
     facts = dict(
-        os=os,
-        kickstart_image=kickstart,
-        platform=platform,
-        hostname=hostname,
-        last_reboot_reason=rr,
-        interfaces=interface_list,
+        os=version.get('rr_sys_ver', None),
+        kickstart_image=version.get('kickstart_ver_str', None),
+        platform=version.get('chassis_id', None),
+        hostname=version.get('host_name', None),
+        last_reboot_reason=version.get('rr_reason', None),
+        interfaces=[each['interface'] for each in detailed_list],
         interfaces_detail=detailed_list,
-        modules=mod_list,
-        power_supply_info=power_supply_list,
-        fan_info=fan_list,
-        vlan_list=get_vlan_info(device)
+        modules=getattr(MODULES, extract)(module),
+        power_supply_info=getattr(POWER_SUPPLIES, extract)(environment),
+        fan_info=getattr(FANS, extract)(environment),
+        vlan_list=getattr(VLAN_BRIEF, extract)(vlan_brief)
     )
 
     return facts
 
 
-def get_interface_detail(device, interface):
+def get_interface_detail(device, interface, lazy=False):
     """Gets  stats for specified interface
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class within device.py
         interface (str): full name of interface
+        lazy (bool): OPTIONAL - return a LazyRecord that converts fields
+            as they are read instead of a dict
 
     Returns:
         dict: all params from show interface command
@@ -2521,95 +2942,116 @@ def get_interface_detail(device, interface):
         return {}
 
     result = xmltodict.parse(xml[1])
-    each = result['ins_api']['outputs']['output']['body'].get(
-        'TABLE_interface')['ROW_interface']
-    intf = str(each.get('interface', None))
-    if intf:
-        temp = {}
-        temp['interface'] = intf
-        temp['state'] = str(each.get('state', None))
-        temp['admin_state'] = str(each.get('admin_state', None))
-        temp['share_state'] = str(each.get('share_state', None))
-        temp['hw_desc'] = str(each.get('eth_hw_desc', None))
-        temp['hw_addr'] = str(each.get('eth_hw_addr', None))
-        temp['bia_addr'] = str(each.get('eth_bia_addr', None))
-        temp['description'] = str(each.get('description', None))
-        temp['mtu'] = str(each.get('eth_mtu', None))
-        temp['bw'] = str(each.get('bw', None))
-        temp['delay'] = str(each.get('dly', None))
-        temp['reliability'] = str(each.get('reliability', None))
-        temp['tx_load'] = str(each.get('eth_txload', None))
-        temp['rx_load'] = str(each.get('rx_txload', None))
-        temp['medium'] = str(each.get('medium', None))
-        temp['mode'] = str(each.get('eth_mode', None))
-        temp['duplex'] = str(each.get('eth_duplex', None))
-        temp['speed'] = str(each.get('eth_speed', None))
-        temp['media'] = str(each.get('eth_media', None))
-        temp['autoneg'] = str(each.get('eth_autoneg', None))
-        temp['description'] = str(each.get('description', None))
-        temp['mtu'] = str(each.get('eth_mtu', None))
-        temp['bw'] = str(each.get('bw', None))
-        temp['delay'] = str(each.get('dly', None))
-        temp['reliability'] = str(each.get('reliability', None))
-        temp['tx_load'] = str(each.get('eth_txload', None))
-        temp['rx_load'] = str(each.get('rx_txload', None))
-        temp['in_flowctrl'] = str(each.get('eth_in_flowctrl', None))
-        temp['out_flowctrl'] = str(each.get('eth_out_flowctrl', None))
-        temp['mdix'] = str(each.get('eth_mdix', None))
-        temp['ratemode'] = str(each.get('eth_ratemode', None))
-        temp['swt_monitor'] = str(each.get('eth_swt_monitor', None))
-        temp['ethertype'] = str(each.get('eth_ethertype', None))
-        temp['eee_state'] = str(each.get('eth_eee_state', None))
-        temp['link_flapped'] = str(each.get('eth_link_flapped', None))
-        temp['clear_counters'] = str(each.get('eth_clear_counters', None))
-        temp['reset_cntr'] = str(each.get('eth_reset_cntr', None))
-        temp['load_interval1_rx'] = str(each.get(
-            'eth_load_interval1_rx', None))
-        temp['inrate1_bits'] = str(each.get('eth_inrate1_bits', None))
-        temp['inrate1_pkts'] = str(each.get('eth_inrate1_pkts', None))
-        temp['load_interval1_tx'] = str(each.get(
-            'eth_load_interval1_tx', None))
-        temp['outrate1_bits'] = str(each.get('eth_outrate1_bits', None))
-        temp['outrate1_pkts'] = str(each.get('eth_outrate1_pkts', None))
-        temp['inucast'] = str(each.get('eth_inucast', None))
-        temp['inmcast'] = str(each.get('eth_inmcast', None))
-        temp['inbcast'] = str(each.get('eth_inbcast', None))
-        temp['inpkts'] = str(each.get('eth_inpkts', None))
-        temp['inbytes'] = str(each.get('eth_inbytes', None))
-        temp['jumbo_inpkts'] = str(each.get('eth_jumbo_inpkts', None))
-        temp['storm_supp'] = str(each.get('eth_storm_supp', None))
-        temp['runts'] = str(each.get('eth_runts', None))
-        temp['giants'] = str(each.get('eth_giants', None))
-        temp['crc'] = str(each.get('eth_crc', None))
-        temp['nobuf'] = str(each.get('eth_nobuf', None))
-        temp['inerr'] = str(each.get('eth_inerr', None))
-        temp['frame'] = str(each.get('eth_frame', None))
-        temp['overrun'] = str(each.get('eth_overrun', None))
-        temp['underrun'] = str(each.get('eth_underrun', None))
-        temp['ignored'] = str(each.get('eth_ignored', None))
-        temp['watchdog'] = str(each.get('eth_watchdog', None))
-        temp['bad_eth'] = str(each.get('eth_bad_eth', None))
-        temp['bad_proto'] = str(each.get('eth_bad_proto', None))
-        temp['in_ifdown_drops'] = str(each.get('eth_in_ifdown_drops', None))
-        temp['dribble'] = str(each.get('eth_dribble', None))
-        temp['indiscard'] = str(each.get('eth_indiscard', None))
-        temp['inpause'] = str(each.get('eth_inpause', None))
-        temp['outucast'] = str(each.get('eth_outucast', None))
-        temp['outmcast'] = str(each.get('eth_outmcast', None))
-        temp['outbcast'] = str(each.get('eth_outbcast', None))
-        temp['outpkts'] = str(each.get('eth_outpkts', None))
-        temp['outbytes'] = str(each.get('eth_outbytes', None))
-        temp['jumbo_outpkts'] = str(each.get('eth_jumbo_outpkts', None))
-        temp['outerr'] = str(each.get('eth_outerr', None))
-        temp['coll'] = str(each.get('eth_coll', None))
-        temp['deferred'] = str(each.get('eth_deferred', None))
-        temp['latecoll'] = str(each.get('eth_latecoll', None))
-        temp['lostcarrier'] = str(each.get('eth_lostcarrier', None))
-        temp['nocarrier'] = str(each.get('eth_nocarrier', None))
-        temp['babbles'] = str(each.get('eth_babbles', None))
-        temp['outdiscard'] = str(each.get('eth_outdiscard', None))
-        temp['outpause'] = str(each.get('eth_outpause', None))
-        return temp
+    return _interface_detail_from_body(
+        result['ins_api']['outputs']['output']['body'], lazy)
+
+
+def iter_interface_details(device, lazy=True):
+    """Gets stats for every interface from a single 'show interface'
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class within device.py
+        lazy (bool): OPTIONAL - yield LazyRecord objects (the default)
+            instead of dicts
+
+    Returns:
+        generator: one record per interface, with the keys of
+        get_interface_detail
+
+    """
+    body = get_command_bodies(device, ['show interface'])[0]
+    rows = INTERFACE_DETAIL.rows(body)
+    convert = INTERFACE_DETAIL.record if lazy else INTERFACE_DETAIL.convert
+    for row in rows:
+        yield convert(row)
+
+
+INTERFACE_DETAIL = Table('TABLE_interface', 'ROW_interface', [
+    ('interface', 'interface'),
+    ('state', 'state'),
+    ('admin_state', 'admin_state'),
+    ('share_state', 'share_state'),
+    ('hw_desc', 'eth_hw_desc'),
+    ('hw_addr', 'eth_hw_addr'),
+    ('bia_addr', 'eth_bia_addr'),
+    ('description', 'description'),
+    ('mtu', 'eth_mtu'),
+    ('bw', 'bw'),
+    ('delay', 'dly'),
+    ('reliability', 'reliability'),
+    ('tx_load', 'eth_txload'),
+    ('rx_load', 'rx_txload'),
+    ('medium', 'medium'),
+    ('mode', 'eth_mode'),
+    ('duplex', 'eth_duplex'),
+    ('speed', 'eth_speed'),
+    ('media', 'eth_media'),
+    ('autoneg', 'eth_autoneg'),
+    ('in_flowctrl', 'eth_in_flowctrl'),
+    ('out_flowctrl', 'eth_out_flowctrl'),
+    ('mdix', 'eth_mdix'),
+    ('ratemode', 'eth_ratemode'),
+    ('swt_monitor', 'eth_swt_monitor'),
+    ('ethertype', 'eth_ethertype'),
+    ('eee_state', 'eth_eee_state'),
+    ('link_flapped', 'eth_link_flapped'),
+    ('clear_counters', 'eth_clear_counters'),
+    ('reset_cntr', 'eth_reset_cntr'),
+    ('load_interval1_rx', 'eth_load_interval1_rx'),
+    ('inrate1_bits', 'eth_inrate1_bits'),
+    ('inrate1_pkts', 'eth_inrate1_pkts'),
+    ('load_interval1_tx', 'eth_load_interval1_tx'),
+    ('outrate1_bits', 'eth_outrate1_bits'),
+    ('outrate1_pkts', 'eth_outrate1_pkts'),
+    ('inucast', 'eth_inucast'),
+    ('inmcast', 'eth_inmcast'),
+    ('inbcast', 'eth_inbcast'),
+    ('inpkts', 'eth_inpkts'),
+    ('inbytes', 'eth_inbytes'),
+    ('jumbo_inpkts', 'eth_jumbo_inpkts'),
+    ('storm_supp', 'eth_storm_supp'),
+    ('runts', 'eth_runts'),
+    ('giants', 'eth_giants'),
+    ('crc', 'eth_crc'),
+    ('nobuf', 'eth_nobuf'),
+    ('inerr', 'eth_inerr'),
+    ('frame', 'eth_frame'),
+    ('overrun', 'eth_overrun'),
+    ('underrun', 'eth_underrun'),
+    ('ignored', 'eth_ignored'),
+    ('watchdog', 'eth_watchdog'),
+    ('bad_eth', 'eth_bad_eth'),
+    ('bad_proto', 'eth_bad_proto'),
+    ('in_ifdown_drops', 'eth_in_ifdown_drops'),
+    ('dribble', 'eth_dribble'),
+    ('indiscard', 'eth_indiscard'),
+    ('inpause', 'eth_inpause'),
+    ('outucast', 'eth_outucast'),
+    ('outmcast', 'eth_outmcast'),
+    ('outbcast', 'eth_outbcast'),
+    ('outpkts', 'eth_outpkts'),
+    ('outbytes', 'eth_outbytes'),
+    ('jumbo_outpkts', 'eth_jumbo_outpkts'),
+    ('outerr', 'eth_outerr'),
+    ('coll', 'eth_coll'),
+    ('deferred', 'eth_deferred'),
+    ('latecoll', 'eth_latecoll'),
+    ('lostcarrier', 'eth_lostcarrier'),
+    ('nocarrier', 'eth_nocarrier'),
+    ('babbles', 'eth_babbles'),
+    ('outdiscard', 'eth_outdiscard'),
+    ('outpause', 'eth_outpause'),
+])
+
+
+def _interface_detail_from_body(body, lazy=False):
+    if lazy:
+        rows = INTERFACE_DETAIL.lazy(body)
+    else:
+        rows = INTERFACE_DETAIL.extract(body)
+    if rows:
+        return rows[0]
     return {}
 
 
@@ -3088,20 +3530,14 @@ def switch_files_list(device, path='bootflash:'):
         list: list of files or sub-dirs in a given directory
         [], if invalid path
 
+    Note:
+        Listings are cached, see filesystem.list_dir.
+
     """
-    command = 'dir ' + path
-    try:
-        data = device.show(command, text=True)
-        data_dict = xmltodict.parse(data[1])
-        files = data_dict['ins_api']['outputs']['output']['body']
-    except (KeyError, CLIError):
+    listing = filesystem.list_dir(device, path)
+    if not listing:
         return []
-    file_list = files.split('\n')
-    my_files = []
-    for each in file_list[:-5]:
-        my_file = each.split(' ')[-1]
-        my_files.append(str(my_file))
-    return my_files
+    return [str(name) for name in listing['entries']]
 
 
 def get_file_path(local_path):
@@ -3159,6 +3595,10 @@ def full_dir_check(device, path):
             if each:
                 dir_list.append(each)
 
+    # one listing of the deepest dir answers the common case
+    if filesystem.list_dir(device, path) is not None:
+        return True, None
+
     active_dir_file_list = switch_files_list(device, preamble)
     bpath = ''
     valid = True, None
@@ -3197,6 +3637,9 @@ def create_dir(device, path):
         clierror = check.get('clierror', 'NOERROR')
     except (KeyError, AttributeError, CLIError):
         return False
+    finally:
+        # after the command, so a listing fetched meanwhile isn't kept
+        filesystem.invalidate(device, path)
 
     if not clierror:
         return False
@@ -3230,6 +3673,8 @@ def delete_dir(device, path):
         clierror = check.get('clierror', 'NOERROR')
     except (KeyError, AttributeError, CLIError):
         return False
+    finally:
+        filesystem.invalidate(device, path)
 
     if not clierror:
         return False
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Jason Edelman <jedelman8@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Small thread pool for running one function against many devices.
+NX-API calls spend nearly all of their time waiting on the network, so
+threads are enough to keep many devices busy at once.
+"""
+try:
+    import sys
+    import threading
+    import Queue
+except ImportError as e:
+    print '*' * 30
+    print e
+    print '*' * 30
+
+__all__ = ['iter_results', 'run']
+
+DEFAULT_WORKERS = 16
+
+_DONE = object()
+
+
+def _worker(func, jobs, results):
+    while True:
+        item = jobs.get()
+        if item is _DONE:
+            results.put(_DONE)
+            return
+        try:
+            results.put((item, func(item), None))
+        except Exception:
+            results.put((item, None, sys.exc_info()[1]))
+
+
+def iter_results(func, items, workers=DEFAULT_WORKERS):
+    """Call ``func`` on every item using a pool of threads and yield
+    each result as soon as it is ready.
+
+    Args:
+        func (callable): called with a single item, e.g. a device
+        items (iterable): e.g. a list of Device objects
+        workers (int): OPTIONAL - maximum number of concurrent calls
+
+    Returns:
+        generator: (item, result, exception) tuples in completion order.
+        ``exception`` is None on success, ``result`` is None on failure.
+
+    """
+    items = list(items)
+    workers = max(1, min(workers, len(items)))
+    jobs = Queue.Queue()
+    results = Queue.Queue()
+    for item in items:
+        jobs.put(item)
+
+    threads = []
+    for _ in range(workers):
+        jobs.put(_DONE)
+        thread = threading.Thread(target=_worker, args=(func, jobs, results))
+        # don't hold the interpreter open if the caller stops iterating
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    running = len(threads)
+    while running:
+        # a timeout keeps the wait interruptible with ctrl-c
+        try:
+            result = results.get(timeout=1)
+        except Queue.Empty:
+            continue
+        if result is _DONE:
+            running -= 1
+        else:
+            yield result
+
+
+def run(func, items, workers=DEFAULT_WORKERS, callback=None):
+    """Call ``func`` on every item in parallel and collect the results.
+
+    Args:
+        func (callable): called with a single item, e.g. a device
+        items (iterable): e.g. a list of Device objects
+        workers (int): OPTIONAL - maximum number of concurrent calls
+        callback (callable): OPTIONAL - called with (item, result, exception)
+            as each call completes
+
+    Returns:
+        list: (item, result, exception) tuples in completion order
+
+    """
+    collected = []
+    for each in iter_results(func, items, workers):
+        if callback:
+            callback(*each)
+        collected.append(each)
+    return collected
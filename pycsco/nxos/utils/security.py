@@ -18,8 +18,11 @@
 try:
     import xmltodict
     import collections
+    import bisect
     from pycsco.nxos.error import CLIError
     from pycsco.nxos.utils import legacy
+    from pycsco.nxos.utils.nxapi_lib import cmd_list_to_string
+    from pycsco.lib import ipaddr
 except ImportError as e:
     print '*' * 30
     print e
@@ -28,6 +31,69 @@ except ImportError as e:
 __all__ = []
 
 
+def _ace_from_row(each, acl_name):
+    """Converts a single ROW_seqno entry from NX-API into an ACE dictionary
+
+    Args:
+        each (dict): ROW_seqno entry
+        acl_name (str): name of the ACL the entry belongs to
+
+    Returns:
+        Dictionary
+    """
+    temp = collections.OrderedDict()
+    keep = {}
+    temp['name'] = acl_name
+    temp['seq'] = each.get('seqno')
+    temp['options'] = {}
+    remark = each.get('remark')
+    if remark:
+        temp['remark'] = remark
+        temp['action'] = 'remark'
+    else:
+        temp['action'] = each.get('permitdeny')
+        temp['proto'] = each.get('proto', each.get('proto_str', each.get('ip')))
+        temp['src'] = each.get('src_any', each.get('src_ip_prefix'))
+        temp['src_port_op'] = each.get('src_port_op')
+        temp['src_port1'] = each.get('src_port1_num')
+        temp['src_port2'] = each.get('src_port2_num')
+        temp['dest'] = each.get('dest_any', each.get('dest_ip_prefix'))
+        temp['dest_port_op'] = each.get('dest_port_op')
+        temp['dest_port1'] = each.get('dest_port1_num')
+        temp['dest_port2'] = each.get('dest_port2_num')
+
+        options = collections.OrderedDict()
+        options['log'] = each.get('log')
+        options['urg'] = each.get('urg')
+        options['ack'] = each.get('ack')
+        options['psh'] = each.get('psh')
+        options['rst'] = each.get('rst')
+        options['syn'] = each.get('syn')
+        options['fin'] = each.get('fin')
+        options['established'] = each.get('established')
+        options['dscp'] = each.get('dscp_str')
+        options['precedence'] = each.get('precedence_str')
+        options['fragments'] = each.get('fragments')
+        options['time_range'] = each.get('timerange')
+
+        options_no_null = {}
+        for k, v in options.iteritems():
+            if v is not None:
+                options_no_null[k] = v
+
+        keep['options'] = options_no_null
+
+    for k, v in temp.iteritems():
+        if v:
+            keep[k] = v
+
+    # ensure options is always in the dict
+    if keep.get('options', 'DNE') == 'DNE':
+        keep['options'] = {}
+
+    return keep
+
+
 def get_acl(device, acl_name, seq_number):
     """Retrieves ACL configuration
 
@@ -70,128 +136,124 @@ def get_acl(device, acl_name, seq_number):
     except KeyError:  # could be raised if no ACEs are configured for an ACL
         return saveme, {'acl': 'no_entries'}, seqs
 
+    # single ACE is returned as a dict rather than a list of dicts
+    if isinstance(acl_entries, dict):
+        acl_entries = [acl_entries]
+
     try:
         for each in acl_entries:
-            temp = collections.OrderedDict()
-            keep = {}
-            temp['name'] = acl_name
-            temp['seq'] = each.get('seqno')
-            temp['options'] = {}
-            remark = each.get('remark')
-            if remark:
-                temp['remark'] = remark
-                temp['action'] = 'remark'
-            else:
-                temp['action'] = each.get('permitdeny')
-                temp['proto'] = each.get('proto', each.get('proto_str', each.get('ip')))
-                temp['src'] = each.get('src_any', each.get('src_ip_prefix'))
-                temp['src_port_op'] = each.get('src_port_op')
-                temp['src_port1'] = each.get('src_port1_num')
-                temp['src_port2'] = each.get('src_port2_num')
-                temp['dest'] = each.get('dest_any', each.get('dest_ip_prefix'))
-                temp['dest_port_op'] = each.get('dest_port_op')
-                temp['dest_port1'] = each.get('dest_port1_num')
-                temp['dest_port2'] = each.get('dest_port2_num')
-
-                options = collections.OrderedDict()
-                options['log'] = each.get('log')
-                options['urg'] = each.get('urg')
-                options['ack'] = each.get('ack')
-                options['psh'] = each.get('psh')
-                options['rst'] = each.get('rst')
-                options['syn'] = each.get('syn')
-                options['fin'] = each.get('fin')
-                options['established'] = each.get('established')
-                options['dscp'] = each.get('dscp_str')
-                options['precedence'] = each.get('precedence_str')
-                options['fragments'] = each.get('fragments')
-                options['time_range'] = each.get('timerange')
-
-                options_no_null = {}
-                for k, v in options.iteritems():
-                    if v is not None:
-                        options_no_null[k] = v
-
-                keep['options'] = options_no_null
-
-            for k, v in temp.iteritems():
-                if v:
-                    keep[k] = v
-
-            # ensure options is always in the dict
-            if keep.get('options', 'DNE') == 'DNE':
-                keep['options'] = {}
+            keep = _ace_from_row(each, acl_name)
 
             if keep.get('seq') == seq_number:
                 saveme = dict(keep)
 
             seqs.append(str(keep.get('seq')))
             new_acl.append(keep)
-    except AttributeError:
-        temp = collections.OrderedDict()
-        keep = {}
-        each = acl_entries
-        temp['name'] = acl_name
-        temp['seq'] = each.get('seqno')
-        temp['options'] = {}
-        remark = each.get('remark')
-        if remark:
-            temp['remark'] = remark
-            temp['action'] = 'remark'
-        else:
-            temp['action'] = each.get('permitdeny')
-            temp['proto'] = each.get('proto', each.get('proto_str'))
-            temp['src'] = each.get('src_any', each.get('src_ip_prefix'))
-            temp['src_port_op'] = each.get('src_port_op')
-
-            temp['src_port1'] = each.get('src_port1_num')
-            temp['src_port2'] = each.get('src_port2_num')
-            temp['dest'] = each.get('dest_any', each.get('dest_ip_prefix'))
-            temp['dest_port_op'] = each.get('dest_port_op')
-            temp['dest_port1'] = each.get('dest_port1_num')
-            temp['dest_port2'] = each.get('dest_port2_num')
-
-            options = collections.OrderedDict()
-            options['log'] = each.get('log')
-            options['urg'] = each.get('urg')
-            options['ack'] = each.get('ack')
-            options['psh'] = each.get('psh')
-            options['rst'] = each.get('rst')
-            options['syn'] = each.get('syn')
-            options['fin'] = each.get('fin')
-            options['established'] = each.get('established')
-            options['dscp'] = each.get('dscp_str')
-            options['precedence'] = each.get('precedence_str')
-            options['fragments'] = each.get('fragments')
-            options['time_range'] = each.get('timerange')
-
-            options_no_null = {}
-            for k, v in options.iteritems():
-                if v:
-                    options_no_null[k] = v
-
-            keep['options'] = options_no_null
-
-        for k, v in temp.iteritems():
-            if v:
-                keep[k] = v
-
-        # ensure options is always in the dict
-        if not keep.get('options'):
-            keep['options'] = {}
-
-        if keep.get('seq') == seq_number:
-            saveme = keep
-
-        seqs.append(str(keep.get('seq')))
-        new_acl.append(keep)
-
     except:
         return {'value': 'error'}, [], []
 
     return saveme, new_acl, seqs
 
 
+def _acl_from_row(acl_row):
+    """Builds the indexed model of one ACL from a ROW_ip_ipv6_mac entry
+
+    Args:
+        acl_row (dict): ROW_ip_ipv6_mac entry
+
+    Returns:
+        String, Dictionary: name of the ACL and its model
+    """
+    acl_name = acl_row.get('acl_name')
+    acl = {'aces': [], 'seqs': [], 'index': {}}
+    try:
+        acl_entries = acl_row['TABLE_seqno']['ROW_seqno']
+    except (KeyError, TypeError):
+        return acl_name, acl
+
+    if isinstance(acl_entries, dict):
+        acl_entries = [acl_entries]
+
+    aces = acl['aces']
+    seqs = acl['seqs']
+    index = acl['index']
+    for each in acl_entries:
+        keep = _ace_from_row(each, acl_name)
+        seq = str(keep.get('seq'))
+        seqs.append(seq)
+        aces.append(keep)
+        index[seq] = keep
+
+    return acl_name, acl
+
+
+def get_acls(device):
+    """Retrieves every IP ACL on the device with a single show command
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class from pycsco
+
+    Returns:
+        Dictionary keyed by ACL name.  Each value is a dictionary with
+          aces: list of all ACEs (same dicts returned by get_acl)
+          seqs: list of all sequence numbers in the ACL
+          index: dictionary mapping each sequence number to its ACE
+    """
+    command = 'show ip access-list'
+    acls = {}
+
+    try:
+        data = device.show(command)
+    except CLIError:
+        return acls
+
+    data_dict = xmltodict.parse(data[1])
+    try:
+        acl_rows = data_dict['ins_api']['outputs']['output']['body'].get(
+            'TABLE_ip_ipv6_mac')['ROW_ip_ipv6_mac']
+    except (KeyError, AttributeError, TypeError):
+        return acls
+
+    if isinstance(acl_rows, dict):
+        acl_rows = [acl_rows]
+
+    for acl_row in acl_rows:
+        name, acl = _acl_from_row(acl_row)
+        acls[name] = acl
+
+    return acls
+
+
+def get_acl_from_model(acls, acl_name, seq_number):
+    """Looks up an ACE in the model built by get_acls.  No device calls
+       are made, so this can be used repeatedly for many sequence numbers.
+
+    Args:
+        acls (dict): ACL model returned by get_acls
+        acl_name (str): Case-sensitive name of the ACL
+        seq_number (str): Number of sequence number you are looking for
+
+    Returns:
+        Dictionary, List, List
+          Same values get_acl returns for the given ACL and seq number
+    """
+    acl = acls.get(acl_name)
+    if acl is None:
+        return {}, [], []
+
+    if not acl['aces']:
+        return {}, {'acl': 'no_entries'}, []
+
+    saveme = acl['index'].get(str(seq_number))
+    if saveme:
+        saveme = dict(saveme)
+    else:
+        saveme = {}
+
+    return saveme, acl['aces'], acl['seqs']
+
+
 def _acl_operand(operand, srcp1, sprcp2):
 
     sub_entry = ' ' + operand
@@ -275,6 +337,534 @@ def config_acl_options(options):
         return command
 
 
+# order options are rendered in when comparing/compiling ACEs
+ACE_OPTION_ORDER = ['urg', 'ack', 'psh', 'rst', 'syn', 'fin', 'established',
+                    'dscp', 'precedence', 'fragments', 'time_range', 'log']
+
+MAX_ACL_SEQ = 4294967295
+
+
+def _ace_body(ace):
+    """Renders an ACE without its sequence number.  Used both to compare
+       existing and desired ACEs and to build the command that configures
+       the ACE, so both sides are always rendered the same way.
+
+    Args:
+        ace (dict): ACE in the same shape get_acl returns
+
+    Returns:
+        String
+    """
+    entry = dict(ace)
+    entry['seq'] = ''
+    body = config_core_acl(entry).strip()
+
+    options = ace.get('options') or {}
+    for option in ACE_OPTION_ORDER:
+        value = options.get(option)
+        if value in (None, False, '', 'disable', 'disabled'):
+            continue
+        if option in ('dscp', 'precedence'):
+            body += ' {0} {1}'.format(option, value)
+        elif option == 'time_range':
+            body += ' time-range {0}'.format(value)
+        else:
+            body += ' ' + option
+
+    return body
+
+
+def _ordered_seqs(desired):
+    """Returns the sequence numbers of the desired ACEs as ints if every
+       ACE has one and they are strictly increasing, else None.
+    """
+    seqs = []
+    last = 0
+    for ace in desired:
+        seq = ace.get('seq')
+        if seq is None or not str(seq).isdigit():
+            return None
+        seq = int(seq)
+        if seq <= last:
+            return None
+        seqs.append(seq)
+        last = seq
+    return seqs
+
+
+def _longest_increasing(values):
+    """Returns the positions of the longest strictly increasing
+       subsequence of values, skipping values of -1.  O(n log n).
+    """
+    tails = []
+    tail_pos = []
+    parents = [-1] * len(values)
+    for pos, value in enumerate(values):
+        if value < 0:
+            continue
+        i = bisect.bisect_left(tails, value)
+        if i == len(tails):
+            tails.append(value)
+            tail_pos.append(pos)
+        else:
+            tails[i] = value
+            tail_pos[i] = pos
+        parents[pos] = tail_pos[i - 1] if i else -1
+
+    keep = set()
+    pos = tail_pos[-1] if tail_pos else -1
+    while pos >= 0:
+        keep.add(pos)
+        pos = parents[pos]
+    return keep
+
+
+def _assign_seqs(anchors, desired_count, step):
+    """Assigns sequence numbers to the ACEs in between the anchors
+
+    Args:
+        anchors (dict): desired index -> seq for ACEs that keep their seq
+        desired_count (int): number of desired ACEs
+        step (int): increment used after the last anchor
+
+    Returns:
+        List of seqs (one per desired ACE) or None if the new ACEs
+          do not fit in the gaps between the anchors
+    """
+    seqs = [None] * desired_count
+    prev = 0
+    run = []
+    for index in range(desired_count + 1):
+        if index < desired_count and index not in anchors:
+            run.append(index)
+            continue
+
+        if index < desired_count:
+            upper = anchors[index]
+        else:
+            upper = None
+
+        if run:
+            if upper is None:
+                gap = step
+                if prev + gap * len(run) > MAX_ACL_SEQ:
+                    return None
+            else:
+                gap = (upper - prev) // (len(run) + 1)
+                if gap < 1:
+                    return None
+            for offset, pos in enumerate(run, 1):
+                seqs[pos] = prev + gap * offset
+            run = []
+
+        if upper is not None:
+            seqs[index] = upper
+            prev = upper
+
+    return seqs
+
+
+def get_acl_batch_commands(acl_name, existing, desired, step=10):
+    """Compiles the commands needed to turn an existing ACL into the
+       desired one and returns them as a single batch for NX-API.
+
+       If every desired ACE has a seq and the seqs are increasing, the
+       seqs are authoritative and ACEs are compared seq by seq.
+       Otherwise the order of the desired list is authoritative: ACEs
+       already configured in the right relative order keep their seq,
+       everything else is removed and new ACEs are slotted into the gaps.
+       When a gap is too small the ACL is resequenced first.
+
+    Args:
+        acl_name (str): Case-sensitive name of the ACL
+        existing (list): ACEs currently configured, as returned by get_acl
+            or get_acls
+        desired (list): ACEs in the same shape get_acl returns
+        step (int): increment between new sequence numbers
+
+    Returns:
+        String: commands separated by " ; " or '' if nothing changes
+
+    Raises:
+        ValueError: if the ACEs can't be numbered within MAX_ACL_SEQ,
+            even after resequencing
+    """
+    if not isinstance(existing, list):
+        # get_acl returns {'acl': 'no_entries'} for an empty ACL
+        existing = []
+
+    existing = sorted(existing, key=lambda ace: int(ace.get('seq')))
+    existing_seqs = [int(ace.get('seq')) for ace in existing]
+    existing_bodies = [_ace_body(ace) for ace in existing]
+    desired_bodies = [_ace_body(ace) for ace in desired]
+
+    removes = []
+    adds = []
+    resequence = None
+
+    desired_seqs = _ordered_seqs(desired)
+    if desired_seqs is not None:
+        current = dict(zip(existing_seqs, existing_bodies))
+        wanted = dict(zip(desired_seqs, desired_bodies))
+        for seq, body in zip(existing_seqs, existing_bodies):
+            if wanted.get(seq) != body:
+                removes.append(seq)
+        for seq, body in zip(desired_seqs, desired_bodies):
+            if current.get(seq) != body:
+                adds.append((seq, body))
+    else:
+        positions = {}
+        for index, body in enumerate(existing_bodies):
+            positions.setdefault(body, collections.deque()).append(index)
+
+        matched = []
+        for body in desired_bodies:
+            candidates = positions.get(body)
+            matched.append(candidates.popleft() if candidates else -1)
+
+        kept = _longest_increasing(matched)
+        kept_existing = set(matched[pos] for pos in kept)
+        removes = [seq for index, seq in enumerate(existing_seqs)
+                   if index not in kept_existing]
+
+        anchors = dict((pos, existing_seqs[matched[pos]]) for pos in kept)
+        seqs = _assign_seqs(anchors, len(desired), step)
+        if seqs is None:
+            # renumber the ACEs that stay so each gap fits the largest run
+            longest = 0
+            run = 0
+            for pos in range(len(desired)):
+                if pos in anchors:
+                    run = 0
+                else:
+                    run += 1
+                    longest = max(longest, run)
+            new_step = step
+            while new_step <= longest:
+                new_step += step
+            resequence = new_step
+            anchors = dict((pos, new_step * (rank + 1)) for rank, pos
+                           in enumerate(sorted(anchors)))
+            seqs = _assign_seqs(anchors, len(desired), new_step)
+            if seqs is None:
+                raise ValueError(
+                    'ACL {0}: {1} ACEs do not fit below sequence number {2} '
+                    'with a step of {3}'.format(
+                        acl_name, len(desired), MAX_ACL_SEQ, new_step))
+
+        for pos, body in enumerate(desired_bodies):
+            if pos not in anchors:
+                adds.append((seqs[pos], body))
+
+    if not removes and not adds and resequence is None:
+        return ''
+
+    commands = ['ip access-list ' + acl_name]
+    for seq in removes:
+        commands.append('no {0}'.format(seq))
+    if resequence:
+        commands.append('resequence ip access-list {0} {1} {1}'.format(
+            acl_name, resequence))
+        commands.append('ip access-list ' + acl_name)
+    for seq, body in sorted(adds):
+        commands.append('{0} {1}'.format(seq, body))
+
+    return cmd_list_to_string(commands)
+
+
+MAX_IPV4 = 2 ** 32 - 1
+MAX_PORT = 65535
+
+
+class _IntervalTree(object):
+    """Static centered interval tree.  Answers "which intervals contain
+       [lo, hi]" in O(log n + k) instead of scanning every interval.
+    """
+    def __init__(self, intervals):
+        """
+        Args:
+            intervals (list): (lo, hi, item) tuples
+        """
+        self.root = self._build(list(intervals))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(lo + (hi - lo) // 2 for lo, hi, item in intervals)
+        center = points[len(points) // 2]
+        left = []
+        right = []
+        here = []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        by_lo = sorted(here, key=lambda interval: interval[0])
+        by_hi = sorted(here, key=lambda interval: interval[1], reverse=True)
+        return (center, by_lo, by_hi, self._build(left), self._build(right))
+
+    def containing(self, lo, hi):
+        """Yields the items of every interval that contains [lo, hi]
+        """
+        node = self.root
+        while node is not None:
+            center, by_lo, by_hi, left, right = node
+            if lo < center:
+                for interval in by_lo:
+                    if interval[0] > lo:
+                        break
+                    if interval[1] >= hi:
+                        yield interval[2]
+                node = left
+            else:
+                for interval in by_hi:
+                    if interval[1] < lo:
+                        break
+                    if interval[1] >= hi:
+                        yield interval[2]
+                node = right
+
+
+def _prefix_range(prefix, cache):
+    """Converts 'any' or an IPv4 prefix into (lo, hi, prefixlen)
+    """
+    if prefix == 'any':
+        return (0, MAX_IPV4, 0)
+    found = cache.get(prefix)
+    if found is None:
+        network = ipaddr.IPNetwork(prefix)
+        if network.version != 4:
+            raise ValueError('only IPv4 prefixes are analysed')
+        found = (int(network.network), int(network.broadcast),
+                 network.prefixlen)
+        cache[prefix] = found
+    return found
+
+
+def _port_ranges(operand, port1, port2):
+    """Converts an ACE port operand into a tuple of (lo, hi) ranges
+    """
+    if not operand:
+        return ((0, MAX_PORT),)
+    port1 = int(port1)
+    if operand == 'eq':
+        return ((port1, port1),)
+    elif operand == 'neq':
+        return tuple(r for r in ((0, port1 - 1), (port1 + 1, MAX_PORT))
+                     if r[0] <= r[1])
+    elif operand == 'lt':
+        return ((0, port1 - 1),)
+    elif operand == 'gt':
+        return ((port1 + 1, MAX_PORT),)
+    elif operand == 'range':
+        return ((port1, int(port2)),)
+    raise ValueError('unknown port operand ' + operand)
+
+
+def _ports_cover(outer, inner):
+    for lo, hi in inner:
+        if not any(olo <= lo and hi <= ohi for olo, ohi in outer):
+            return False
+    return True
+
+
+def _ace_space(ace, cache):
+    """Builds the match space of an ACE or None if it can't be analysed
+    """
+    try:
+        src = _prefix_range(ace['src'], cache)
+        dest = _prefix_range(ace['dest'], cache)
+        src_ports = _port_ranges(ace.get('src_port_op'),
+                                 ace.get('src_port1'), ace.get('src_port2'))
+        dest_ports = _port_ranges(ace.get('dest_port_op'),
+                                  ace.get('dest_port1'),
+                                  ace.get('dest_port2'))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    # log doesn't change what an ACE matches
+    options = frozenset((k, v) for k, v in (ace.get('options') or {}).items()
+                        if v and k != 'log')
+
+    return dict(action=ace.get('action'), proto=ace.get('proto'),
+                src=src, dest=dest, src_ports=src_ports,
+                dest_ports=dest_ports, options=options)
+
+
+def _space_covers(outer, inner):
+    if outer['proto'] != 'ip' and outer['proto'] != inner['proto']:
+        return False
+    if not outer['options'] <= inner['options']:
+        return False
+    for field in ('src', 'dest'):
+        if outer[field][0] > inner[field][0] \
+                or outer[field][1] < inner[field][1]:
+            return False
+    return (_ports_cover(outer['src_ports'], inner['src_ports'])
+            and _ports_cover(outer['dest_ports'], inner['dest_ports']))
+
+
+def _spaces_overlap(one, two):
+    if one['proto'] != 'ip' and two['proto'] != 'ip' \
+            and one['proto'] != two['proto']:
+        return False
+    for field in ('src', 'dest'):
+        if one[field][1] < two[field][0] or two[field][1] < one[field][0]:
+            return False
+    return True
+
+
+def get_acl_analysis(aces):
+    """Finds ACEs that can never match or that can be combined
+
+       shadowed: an earlier ACE with a different action matches
+           everything this ACE matches, so it never takes effect
+       redundant: an earlier ACE with the same action matches
+           everything this ACE matches, so it can be removed
+       mergeable: two ACEs that are identical apart from sibling
+           source (or destination) prefixes and can be replaced by
+           one ACE using the supernet
+
+       Only coverage by a single earlier ACE is detected.  Remarks and
+       ACEs that aren't IPv4 prefix/any based are reported as skipped.
+
+    Args:
+        aces (list): ACEs as returned by get_acl or get_acls
+
+    Returns:
+        Dictionary with keys shadowed, redundant, mergeable and skipped
+    """
+    analysis = {'shadowed': [], 'redundant': [], 'mergeable': [],
+                'skipped': []}
+    if not isinstance(aces, list):
+        return analysis
+
+    cache = {}
+    spaces = []
+    for ace in aces:
+        if ace.get('action') == 'remark':
+            continue
+        space = _ace_space(ace, cache)
+        if space is None:
+            analysis['skipped'].append(str(ace.get('seq')))
+            continue
+        space['seq'] = str(ace.get('seq'))
+        spaces.append(space)
+
+    # Address ranges are CIDR prefixes, so the ranges containing a prefix
+    # are its supernets: one per prefix length in use.  ACEs are bucketed
+    # by (src prefix, dest prefix) and each bucket gets an interval tree
+    # over the distinct destination port spans of its ACEs.  Only ACEs
+    # already checked and not covered themselves are candidates: whatever
+    # a covered ACE covers, the ACE covering it covers first.
+    src_lengths = sorted(set(space['src'][2] for space in spaces))
+    dest_lengths = sorted(set(space['dest'][2] for space in spaces))
+
+    def bucket_key(space):
+        return (space['src'][0], space['src'][2],
+                space['dest'][0], space['dest'][2])
+
+    def port_span(space):
+        return (space['dest_ports'][0][0], space['dest_ports'][-1][1])
+
+    bucket_spans = {}
+    for space in spaces:
+        bucket_spans.setdefault(bucket_key(space), set()).add(
+            port_span(space))
+
+    trees = {}
+    live = {}
+    exact = {}
+    dead = {}
+    for index, space in enumerate(spaces):
+        identity = (space['proto'], space['src'], space['dest'],
+                    space['src_ports'], space['dest_ports'], space['options'])
+        first = exact.get(identity)
+        if first is not None:
+            # identical to an earlier ACE, which is either live or was
+            # itself covered first by the same ACE that covers this one
+            first = dead.get(first, first)
+        else:
+            exact[identity] = index
+            lo, hi = port_span(space)
+            for src_length in src_lengths:
+                if src_length > space['src'][2]:
+                    break
+                src_net = space['src'][0] & (
+                    MAX_IPV4 ^ (MAX_IPV4 >> src_length))
+                for dest_length in dest_lengths:
+                    if dest_length > space['dest'][2]:
+                        break
+                    dest_net = space['dest'][0] & (
+                        MAX_IPV4 ^ (MAX_IPV4 >> dest_length))
+                    key = (src_net, src_length, dest_net, dest_length)
+                    by_span = live.get(key)
+                    if not by_span:
+                        continue
+                    tree = trees.get(key)
+                    if tree is None:
+                        tree = trees[key] = _IntervalTree(
+                            span + (span,) for span in bucket_spans[key])
+                    for span in tree.containing(lo, hi):
+                        for candidate in by_span.get(span, ()):
+                            if first is not None and candidate > first:
+                                break
+                            if _space_covers(spaces[candidate], space):
+                                first = candidate
+                                break
+
+        if first is not None:
+            dead[index] = first
+            finding = {'seq': space['seq'], 'by': spaces[first]['seq']}
+            if spaces[first]['action'] == space['action']:
+                analysis['redundant'].append(finding)
+            else:
+                analysis['shadowed'].append(finding)
+        else:
+            live.setdefault(bucket_key(space), {}).setdefault(
+                port_span(space), []).append(index)
+
+    for field, other in (('src', 'dest'), ('dest', 'src')):
+        siblings = {}
+        for index, space in enumerate(spaces):
+            if index in dead:
+                continue
+            lo, hi, length = space[field]
+            if length == 0:
+                continue
+            key = (space['action'], space['proto'], space[other],
+                   space['src_ports'], space['dest_ports'], space['options'],
+                   length)
+            size = hi - lo + 1
+            partner = siblings.pop(key + (lo ^ size,), None)
+            if partner is None:
+                siblings[key + (lo,)] = index
+                continue
+
+            conflict = False
+            for between in range(partner + 1, index):
+                if spaces[between]['action'] != space['action'] and (
+                        _spaces_overlap(spaces[between], space)
+                        or _spaces_overlap(spaces[between], spaces[partner])):
+                    conflict = True
+                    break
+            if conflict:
+                siblings[key + (lo,)] = index
+                continue
+
+            supernet = ipaddr.IPNetwork('{0}/{1}'.format(
+                ipaddr.IPAddress(min(lo, lo ^ size), version=4), length - 1))
+            analysis['mergeable'].append({
+                'seqs': [spaces[partner]['seq'], space['seq']],
+                'field': field,
+                'prefix': str(supernet)})
+
+    return analysis
+
+
 def get_acl_interface(device, acl):
     """Checks to see if an ACL is applied to an interface
 
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Jason Edelman <jedelman8@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stores the results of getters (get_facts, get_vlan_info, get_vpc,
+get_neighbors, ...) over time.
+
+Every dict or list of a result that isn't tiny is stored once as a
+compressed object named by the sha1 of its content, so sub-trees that
+didn't change between polls cost nothing.  Lists of rows sharing the
+same keys are stored column-wise (keys once, then one list of values per
+row).  Each device has an append-only index of (timestamp, kind, root)
+records used for the latest and time-range lookups.
+
+Example:
+    store = SnapshotStore(DirectoryBackend('/var/lib/pycsco'))
+    store.save(device.ip, 'facts', get_facts(device))
+    facts = store.latest(device.ip, 'facts')
+
+"""
+try:
+    import os
+    import json
+    import zlib
+    import time
+    import bisect
+    import struct
+    import hashlib
+    import threading
+    import urllib
+    from pycsco.nxos.error import SnapshotError
+except ImportError as e:
+    print '*' * 30
+    print e
+    print '*' * 30
+
+__all__ = ['SnapshotStore', 'MemoryBackend', 'DirectoryBackend']
+
+# containers that encode shorter than this are kept inline in their parent
+MIN_OBJECT = 64
+
+_REF = '\x00r'
+_COLUMNS = '\x00c'
+_ESCAPE = '\x00'
+
+_HEADER = struct.Struct('>20sI')
+
+
+class MemoryBackend(object):
+    """Keeps objects and indexes in memory, mostly useful for tests and
+    short lived processes.
+    """
+    def __init__(self):
+        self.objects = {}
+        self.indexes = {}
+
+    def has(self, digest):
+        return digest in self.objects
+
+    def get(self, digest):
+        return self.objects[digest]
+
+    def put(self, digest, data):
+        self.objects[digest] = data
+
+    def append(self, device, record):
+        self.indexes.setdefault(device, []).append(record)
+
+    def records(self, device):
+        return list(self.indexes.get(device, []))
+
+    def devices(self):
+        return self.indexes.keys()
+
+
+class DirectoryBackend(object):
+    """Keeps all objects in one append-only pack file and one index file
+    per device under ``path``.  Only one process should write to a
+    directory at a time.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.index_dir = os.path.join(path, 'index')
+        if not os.path.isdir(self.index_dir):
+            os.makedirs(self.index_dir)
+        self.pack_path = os.path.join(path, 'objects.pack')
+        self.offsets = {}
+        self._scan()
+
+    def _scan(self):
+        if not os.path.isfile(self.pack_path):
+            return
+        with open(self.pack_path, 'rb') as pack:
+            offset = 0
+            while True:
+                header = pack.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                digest, length = _HEADER.unpack(header)
+                offset += _HEADER.size
+                self.offsets[digest.encode('hex')] = (offset, length)
+                offset += length
+                pack.seek(offset)
+
+    def has(self, digest):
+        return digest in self.offsets
+
+    def get(self, digest):
+        offset, length = self.offsets[digest]
+        with open(self.pack_path, 'rb') as pack:
+            pack.seek(offset)
+            return pack.read(length)
+
+    def put(self, digest, data):
+        with open(self.pack_path, 'ab') as pack:
+            pack.seek(0, os.SEEK_END)
+            pack.write(_HEADER.pack(digest.decode('hex'), len(data)))
+            self.offsets[digest] = (pack.tell(), len(data))
+            pack.write(data)
+
+    def _index_path(self, device):
+        return os.path.join(self.index_dir, urllib.quote(device, safe=''))
+
+    def append(self, device, record):
+        # one JSON list per line so any kind, spaces included, round trips
+        with open(self._index_path(device), 'a') as index:
+            index.write(json.dumps(list(record)) + '\n')
+
+    def records(self, device):
+        path = self._index_path(device)
+        if not os.path.isfile(path):
+            return []
+        records = []
+        with open(path) as index:
+            for number, line in enumerate(index, 1):
+                if not line.strip():
+                    continue
+                try:
+                    timestamp, kind, digest = json.loads(line)
+                    records.append((float(timestamp), kind, str(digest)))
+                except (ValueError, TypeError):
+                    raise SnapshotError(
+                        'corrupt record on line {0} of {1}'.format(
+                            number, path))
+        return records
+
+    def devices(self):
+        return [urllib.unquote(name) for name in os.listdir(self.index_dir)]
+
+
+class SnapshotStore(object):
+    """Content-addressed store of device state snapshots.
+
+    Args:
+        backend (object): OPTIONAL - where objects and indexes are kept,
+            see MemoryBackend and DirectoryBackend.  Anything with the
+            same methods can be used.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.lock = threading.Lock()
+        self.index_cache = {}
+
+    def _put(self, data):
+        digest = hashlib.sha1(data).hexdigest()
+        if not self.backend.has(digest):
+            self.backend.put(digest, zlib.compress(data))
+        return digest
+
+    def _encode(self, node, root=False):
+        if isinstance(node, dict):
+            encoded = {}
+            for key, value in node.iteritems():
+                if isinstance(key, basestring) and key.startswith(_ESCAPE):
+                    key = _ESCAPE + key
+                encoded[key] = self._encode(value)
+        elif isinstance(node, (list, tuple)):
+            keys = None
+            if len(node) > 1 and isinstance(node[0], dict):
+                keys = sorted(node[0])
+                for row in node:
+                    if not isinstance(row, dict) or len(row) != len(keys) \
+                            or any(key not in row for key in keys):
+                        keys = None
+                        break
+            if keys is not None:
+                encoded = {_COLUMNS: [keys, [
+                    [self._encode(row[key]) for key in keys] for row in node]]}
+            else:
+                encoded = [self._encode(value) for value in node]
+        else:
+            return node
+
+        data = json.dumps(encoded, sort_keys=True, separators=(',', ':'))
+        if root or len(data) >= MIN_OBJECT:
+            return {_REF: self._put(data)}
+        return encoded
+
+    def _decode(self, node):
+        if isinstance(node, dict):
+            if len(node) == 1:
+                if _REF in node:
+                    return self._load(node[_REF])
+                if _COLUMNS in node:
+                    keys, rows = node[_COLUMNS]
+                    return [dict(zip(keys, [self._decode(v) for v in row]))
+                            for row in rows]
+            decoded = {}
+            for key, value in node.iteritems():
+                if key.startswith(_ESCAPE):
+                    key = key[1:]
+                decoded[key] = self._decode(value)
+            return decoded
+        elif isinstance(node, list):
+            return [self._decode(value) for value in node]
+        return node
+
+    def _load(self, digest):
+        try:
+            data = zlib.decompress(self.backend.get(digest))
+        except KeyError:
+            raise SnapshotError('object {0} is missing'.format(digest))
+        except zlib.error:
+            raise SnapshotError('object {0} is corrupt'.format(digest))
+        if hashlib.sha1(data).hexdigest() != digest:
+            raise SnapshotError('object {0} is corrupt'.format(digest))
+        return self._decode(json.loads(data))
+
+    def _records(self, device):
+        records = self.index_cache.get(device)
+        if records is None:
+            records = self.index_cache[device] = sorted(
+                self.backend.records(device))
+        return records
+
+    def save(self, device, kind, data, timestamp=None):
+        """Store a snapshot.
+
+        Args:
+            device (str): device name or ip
+            kind (str): what the data is, e.g. 'facts' or 'vlans'
+            data (dict): output of a getter, anything JSON serializable
+            timestamp (float): OPTIONAL - epoch seconds, defaults to now
+
+        Returns:
+            str: digest of the snapshot, equal digests mean equal data
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            digest = self._encode(data, root=True)[_REF]
+            record = (timestamp, kind, digest)
+            records = self._records(device)
+            if records and records[-1][0] > timestamp:
+                # keep the cached index ordered, the backend only appends
+                bisect.insort(records, record)
+            else:
+                records.append(record)
+            self.backend.append(device, record)
+        return digest
+
+    def latest(self, device, kind):
+        """Returns the most recent snapshot of ``kind`` for the device,
+        or None if there is none.
+        """
+        with self.lock:
+            for timestamp, each_kind, digest in reversed(
+                    self._records(device)):
+                if each_kind == kind:
+                    return self._load(digest)
+
+    def history(self, device, kind, start=None, end=None):
+        """Snapshots of ``kind`` for the device between ``start`` and
+        ``end`` (epoch seconds, both inclusive and optional).
+
+        Returns:
+            list: (timestamp, data) tuples, oldest first
+        """
+        with self.lock:
+            records = self._records(device)
+            timestamps = [record[0] for record in records]
+            low = 0
+            if start is not None:
+                low = bisect.bisect_left(timestamps, start)
+            high = len(records)
+            if end is not None:
+                high = bisect.bisect_right(timestamps, end)
+            wanted = [(timestamp, digest) for timestamp, each_kind, digest
+                      in records[low:high] if each_kind == kind]
+            return [(timestamp, self._load(digest))
+                    for timestamp, digest in wanted]
+
+    def devices(self):
+        return self.backend.devices()
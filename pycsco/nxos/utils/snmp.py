@@ -21,59 +21,58 @@ import json
 
 try:
     import xmltodict
+    from pycsco.nxos.error import CLIError
+    from pycsco.nxos.utils.tables import get_rows
+    from pycsco.nxos.utils.nxapi_lib import get_command_bodies, \
+        execute_commands
 except ImportError as e:
     print '*' * 30
     print e
     print '*' * 30
 
-__all__ = []
+__all__ = ['SnmpState', 'get_snmp_state', 'get_commands_snmp_state',
+           'config_snmp_state']
 
 
-def get_snmp_community(device, find_filter=None):
+def _communities_from_body(body):
+    c_dict = {}
+    for each in get_rows(body, 'TABLE_snmp_community', 'ROW_snmp_community'):
+        community = {}
+        key = str(each['community_name'])
+        community['group'] = str(each['grouporaccess'])
+        community['acl'] = str(each['aclfilter'])
+        c_dict[key] = community
+    return c_dict
+
+
+def get_snmp_community(device, find_filter=None, state=None):
     """Retrieves snmp community settings for a given device
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class
         community (str): optional arg to filter out this specific community
+        state (SnmpState): optional output of get_snmp_state to use instead
+            of querying the device
 
     Returns:
         dictionary
     """
-    command = 'show snmp community'
-    data = device.show(command)
-    data_dict = xmltodict.parse(data[1])
+    if state is not None:
+        c_dict = state.communities
+    else:
+        command = 'show snmp community'
+        data = device.show(command)
+        data_dict = xmltodict.parse(data[1])
+        c_dict = _communities_from_body(
+            data_dict['ins_api']['outputs']['output']['body'])
 
-    c_dict = {}
+    find = c_dict.get(find_filter) if find_filter else None
 
-    try:
-        comm_table = data_dict['ins_api']['outputs']['output']['body'].get(
-            'TABLE_snmp_community')['ROW_snmp_community']
-
-        for each in comm_table:
-            community = {}
-            key = str(each['community_name'])
-            community['group'] = str(each['grouporaccess'])
-            community['acl'] = str(each['aclfilter'])
-            c_dict[key] = community
-
-    except (TypeError):
-            community = {}
-            key = str(each['community_name'])
-            community['group'] = str(comm_table['grouporaccess'])
-            community['acl'] = str(comm_table['aclfilter'])
-            c_dict[key] = community
-
-    except (KeyError, AttributeError):
-        return c_dict
-
-    if find_filter:
-        find = c_dict.get(find_filter, None)
-
-    if find_filter is None or find is None:
+    if find is None:
         return {}
     else:
-        return find
+        return dict(find)
 
 
 def remove_snmp_community(community):
@@ -94,32 +93,31 @@ def config_snmp_community(delta, community):
     return commands
 
 
-def get_snmp_groups(device):
+def _groups_from_body(body):
+    return [each['role_name'] for each in get_rows(body, 'TABLE_role',
+                                                   'ROW_role')]
+
+
+def get_snmp_groups(device, state=None):
     """Retrieves snmp groups for a given device
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class
+        state (SnmpState): optional output of get_snmp_state to use instead
+            of querying the device
 
     Returns:
         list of groups
     """
+    if state is not None:
+        return list(state.groups)
+
     command = 'show snmp group'
     data = device.show(command)
     data_dict = xmltodict.parse(data[1])
 
-    g_list = []
-
-    try:
-        group_table = data_dict['ins_api']['outputs']['output']['body'].get(
-            'TABLE_role')['ROW_role']
-        for each in group_table:
-            g_list.append(each['role_name'])
-
-    except (KeyError, AttributeError):
-        return g_list
-
-    return g_list
+    return _groups_from_body(data_dict['ins_api']['outputs']['output']['body'])
 
 
 def remove_snmp_user(user):
@@ -162,171 +160,176 @@ def config_snmp_user(proposed, user, reset, new):
     return commands
 
 
-def get_snmp_user(device, user):
+def _user_from_row(row):
+    resource = {}
+    resource['user'] = str(row['user'])
+    resource['authentication'] = str(row['auth']).strip()
+    encrypt = str(row['priv']).strip()
+    if encrypt.startswith('aes'):
+        resource['encrypt'] = 'aes-128'
+    else:
+        resource['encrypt'] = 'none'
+
+    resource['group'] = [str(group['group']) for group in
+                         get_rows(row, 'TABLE_groups', 'ROW_groups')]
+    return resource
+
+
+def _users_from_body(body):
+    users = {}
+    for row in get_rows(body, 'TABLE_snmp_users', 'ROW_snmp_users'):
+        try:
+            resource = _user_from_row(row)
+        except KeyError:
+            continue
+        users[resource['user']] = resource
+    return users
+
+
+def get_snmp_user(device, user, state=None):
     """Retrieves snmp user configuration for a given user on a given device
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class
         user (str): name of user (max size 28 chars)
+        state (SnmpState): optional output of get_snmp_state to use instead
+            of querying the device
 
     Returns:
         dictionary
     """
-    command = 'show snmp user ' + user
-    data = device.show(command)
-    data_dict = xmltodict.parse(data[1])
-
-    resource = {}
-
-    try:
-        resource_table = data_dict['ins_api']['outputs']['output']['body'].get(
-            'TABLE_snmp_users')['ROW_snmp_users']
-
-        resource['user'] = str(resource_table['user'])
-        resource['authentication'] = str(resource_table['auth']).strip()
-        encrypt = str(resource_table['priv']).strip()
-        if encrypt.startswith('aes'):
-            resource['encrypt'] = 'aes-128'
-        else:
-            resource['encrypt'] = 'none'
-
-        group_table = resource_table['TABLE_groups']['ROW_groups']
+    if state is not None:
+        users = state.users
+    else:
+        command = 'show snmp user ' + user
+        data = device.show(command)
+        data_dict = xmltodict.parse(data[1])
+        users = _users_from_body(
+            data_dict['ins_api']['outputs']['output']['body'])
+
+    resource = users.get(user)
+    if resource is None:
+        return {}
+    resource = dict(resource)
+    resource['group'] = list(resource['group'])
+    return resource
 
-        groups = []
-        try:
-            for group in group_table:
-                groups.append(str(group['group']))
-        except TypeError:
-            groups.append(str(group_table['group']))
 
-        resource['group'] = groups
+def _running_value(raw_text, template):
+    existing = legacy.get_structured_data(template, raw_text)
 
-    except (KeyError, AttributeError):
-        return resource
+    if len(existing) == 1:
+        return existing[0]
 
-    return resource
+    return existing
 
 
-def get_snmp_contact(device):
+def get_snmp_contact(device, state=None):
     """Retrieves snmp contact from a device
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class
+        state (SnmpState): optional output of get_snmp_state to use instead
+            of querying the device
 
     Returns:
         dictionary
     """
-    command = 'show run snmp'
-    data = device.show(command, text=True)
-    data_dict = xmltodict.parse(data[1])
-
-    raw_text = data_dict['ins_api']['outputs']['output']['body']
-
-    existing = legacy.get_structured_data('snmp_contact.tmpl', raw_text)
+    if state is not None:
+        raw_text = state.running_config
+    else:
+        command = 'show run snmp'
+        data = device.show(command, text=True)
+        data_dict = xmltodict.parse(data[1])
 
-    if len(existing) == 1:
-        return existing[0]
+        raw_text = data_dict['ins_api']['outputs']['output']['body']
 
-    return existing
+    return _running_value(raw_text, 'snmp_contact.tmpl')
 
 
-def get_snmp_location(device):
+def get_snmp_location(device, state=None):
     """Retrieves snmp location from a device
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class
+        state (SnmpState): optional output of get_snmp_state to use instead
+            of querying the device
 
     Returns:
         dictionary
     """
-    command = 'show run snmp'
-    data = device.show(command, text=True)
-    data_dict = xmltodict.parse(data[1])
+    if state is not None:
+        raw_text = state.running_config
+    else:
+        command = 'show run snmp'
+        data = device.show(command, text=True)
+        data_dict = xmltodict.parse(data[1])
 
-    raw_text = data_dict['ins_api']['outputs']['output']['body']
+        raw_text = data_dict['ins_api']['outputs']['output']['body']
 
-    existing = legacy.get_structured_data('snmp_location.tmpl', raw_text)
+    return _running_value(raw_text, 'snmp_location.tmpl')
 
-    if len(existing) == 1:
-        return existing[0]
 
-    return existing
+def _host_from_row(row):
+    temp = {}
+    temp['udp'] = str(row['port']).strip()
+    temp['version'] = str(row['version']).strip()
+    temp['v3'] = str(row['level']).strip()
+    temp['type'] = str(row['type']).strip()
+    temp['community'] = str(row['secname']).strip()
+    src = row.get('src_intf', None)
+    if src:
+        temp['src_intf'] = src.split(':')[1].strip()
+
+    vrf_filt = row.get('TABLE_vrf_filters', None)
+    if vrf_filt:
+        temp['vrf_filter'] = vrf_filt['ROW_vrf_filters']['vrf_filter'].split(':')[1].split(',')
+
+    vrf = row.get('vrf', None)
+    if vrf:
+        temp['vrf'] = vrf.split(':')[1].strip()
 
+    return temp
 
-def get_snmp_host(device, host):
+
+def _hosts_from_body(body):
+    resource = {}
+    for row in get_rows(body, 'TABLE_host', 'ROW_host'):
+        try:
+            resource[str(row['host'])] = _host_from_row(row)
+        except KeyError:
+            continue
+    return resource
+
+
+def get_snmp_host(device, host, state=None):
     """Retrieves snmp host configuration for a given host on a given device
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class
         host (str): IP Address or hostname of snmp host
+        state (SnmpState): optional output of get_snmp_state to use instead
+            of querying the device
 
     Returns:
         dictionary
     """
-    command = 'show snmp host'
-    data = device.show(command)
-    data_dict = xmltodict.parse(data[1])
-
-    resource = {}
-
-    try:
-        resource_table = data_dict['ins_api']['outputs']['output']['body'].get(
-            'TABLE_host')['ROW_host']
-
-        for each in resource_table:
-            temp = {}
-            key = str(each['host'])
-            temp['udp'] = str(each['port']).strip()
-            temp['version'] = str(each['version']).strip()
-            temp['v3'] = str(each['level']).strip()
-            temp['type'] = str(each['type']).strip()
-            temp['community'] = str(each['secname']).strip()
-            src = each.get('src_intf', None)
-            if src:
-                temp['src_intf'] = src.split(':')[1].strip()
-
-            vrf_filt = each.get('TABLE_vrf_filters', None)
-            if vrf_filt:
-                temp['vrf_filter'] = vrf_filt['ROW_vrf_filters']['vrf_filter'].split(':')[1].split(',')
-
-            vrf = each.get('vrf', None)
-            if vrf:
-                temp['vrf'] = vrf.split(':')[1].strip()
-
-            resource[key] = temp
-
-    except (TypeError):
-        temp = {}
-        key = str(resource_table['host'])
-        temp['udp'] = str(resource_table['port']).strip()
-        temp['version'] = str(resource_table['version']).strip()
-        temp['v3'] = str(resource_table['level']).strip()
-        temp['type'] = str(resource_table['type']).strip()
-        temp['community'] = str(resource_table['secname']).strip()
-        src = resource_table.get('src_intf', None)
-        if src:
-            temp['src_intf'] = src.split(':')[1].strip()
-
-        vrf_filt = resource_table.get('TABLE_vrf_filters', None)
-        if vrf_filt:
-            temp['vrf_filter'] = vrf_filt['ROW_vrf_filters']['vrf_filter'].split(':')[1].split(',')
-
-        vrf = resource_table.get('vrf', None)
-        if vrf:
-            temp['vrf'] = vrf.split(':')[1].strip()
-
-        resource[key] = temp
-
-    except (KeyError, AttributeError):
-        return resource
+    if state is not None:
+        resource = state.hosts
+    else:
+        command = 'show snmp host'
+        data = device.show(command)
+        data_dict = xmltodict.parse(data[1])
+        resource = _hosts_from_body(
+            data_dict['ins_api']['outputs']['output']['body'])
 
     find = resource.get(host, None)
     if find:
-        return find
+        return dict(find)
     else:
         return {}
 
@@ -397,53 +400,242 @@ def config_snmp_host(delta, proposed, existing):
     return commands
 
 
-def get_snmp_traps(device, group):
+TRAP_GROUPS = ['aaa', 'bridge', 'callhome', 'cfs', 'config', 'entity',
+               'feature-control', 'hsrp', 'license', 'link', 'lldp', 'ospf',
+               'rf', 'rmon', 'snmp', 'storm-control', 'stpx', 'sysmgr',
+               'system', 'upgrade', 'vtp']
+
+
+def _traps_from_body(body):
+    resource = dict((each, []) for each in TRAP_GROUPS)
+
+    for each in get_rows(body, 'TABLE_snmp_trap', 'ROW_snmp_trap'):
+        temp = {}
+
+        key = str(each['trap_type'])
+
+        temp['trap'] = str(each['description'])
+        temp['enabled'] = str(each['isEnabled'])
+
+        if key != 'Generic':
+            resource.setdefault(key, []).append(temp)
+
+    return resource
+
+
+def get_snmp_traps(device, group, state=None):
     """Retrieves snmp traps configuration for a given device
 
     Args:
         device (Device): This is the device object of an NX-API enabled device
             using the Device class
         group (str): group of snmp traps as defined in the switch
+        state (SnmpState): optional output of get_snmp_state to use instead
+            of querying the device
 
     Returns:
         list
     """
-    command = 'show snmp trap'
-    data = device.show(command)
-    data_dict = xmltodict.parse(data[1])
+    if state is not None:
+        resource = state.traps
+    else:
+        command = 'show snmp trap'
+        data = device.show(command)
+        data_dict = xmltodict.parse(data[1])
+        resource = _traps_from_body(
+            data_dict['ins_api']['outputs']['output']['body'])
 
-    resource = {}
+    find = resource.get(group, None)
 
+    if group == 'all'.lower():
+        return dict((key, list(value)) for key, value in resource.iteritems())
+    elif find:
+        return list(find)
+    else:
+        return []
+
+
+SNMP_COMMANDS = ['show snmp community', 'show snmp group', 'show snmp user',
+                 'show snmp host', 'show snmp trap']
+
+
+class SnmpState(object):
+    """All of the SNMP configuration of a device.  Every snmp getter
+    accepts one as ``state`` instead of querying the device itself.
+
+    Args:
+        bodies (list): bodies of the SNMP_COMMANDS, in order, None for a
+            command that failed
+        running_config (str): text of 'show run snmp'
+    """
+    def __init__(self, bodies, running_config):
+        community, group, user, host, trap = bodies
+        # community name -> dict as returned by get_snmp_community
+        self.communities = _communities_from_body(community)
+        self.groups = _groups_from_body(group)
+        # user name -> dict as returned by get_snmp_user
+        self.users = _users_from_body(user)
+        # host -> dict as returned by get_snmp_host
+        self.hosts = _hosts_from_body(host)
+        # trap group -> list as returned by get_snmp_traps
+        self.traps = _traps_from_body(trap)
+        self.running_config = running_config or ''
+
+
+def get_snmp_state(device):
+    """Retrieves all snmp configuration of a device with two requests,
+    one for the SNMP_COMMANDS and one for 'show run snmp'
+
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class
+
+    Returns:
+        SnmpState
+    """
     try:
-        resource_table = data_dict['ins_api']['outputs']['output']['body'].get(
-            'TABLE_snmp_trap')['ROW_snmp_trap']
+        bodies = get_command_bodies(device, SNMP_COMMANDS)
+    except CLIError:
+        bodies = []
+        for command in SNMP_COMMANDS:
+            try:
+                bodies.append(get_command_bodies(device, [command])[0])
+            except CLIError:
+                bodies.append(None)
+    running_config = get_command_bodies(device, ['show run snmp'],
+                                        text=True)[0]
+    return SnmpState(bodies, running_config)
+
+
+def _delta(proposed, existing):
+    return dict((key, value) for key, value in proposed.iteritems()
+                if value is not None and existing.get(key) != value)
+
+
+def _vrf_filter(value):
+    # get_snmp_host returns a list of unstripped names, callers usually
+    # pass a comma separated string
+    if isinstance(value, basestring):
+        value = value.split(',')
+    return sorted(set(str(each).strip() for each in value if each.strip()))
+
+
+def _host_delta(host, proposed, existing):
+    proposed = dict(proposed)
+    if proposed.get('vrf_filter') is not None:
+        proposed['vrf_filter'] = ','.join(_vrf_filter(proposed['vrf_filter']))
+    existing = dict(existing or {})
+    if existing.get('vrf_filter') is not None:
+        existing['vrf_filter'] = ','.join(_vrf_filter(existing['vrf_filter']))
+
+    delta = _delta(proposed, existing)
+    if not existing and any(key in delta for key in
+                            ('type', 'version', 'v3', 'community')):
+        if delta.get('version') not in ('v2c', 'v3') or not delta.get('type'):
+            raise ValueError(
+                'snmp host {0}: a new host needs type and version '
+                '(v2c or v3)'.format(host))
+    return delta
+
+
+def get_commands_snmp_state(state, communities=None, users=None, hosts=None):
+    """Gets the commands that bring many snmp communities, users and hosts
+    to a desired state
 
-        for each in ['aaa', 'bridge', 'callhome', 'cfs', 'config', 'entity',
-                     'feature-control', 'hsrp', 'license', 'link', 'lldp',
-                     'ospf', 'rf', 'rmon', 'snmp', 'storm-control', 'stpx',
-                     'sysmgr', 'system', 'upgrade', 'vtp']:
+    Args:
+        state (SnmpState): output of get_snmp_state
+        communities (dict): optional community -> dict of group and/or acl,
+            or None to remove the community
+        users (dict): optional user -> dict of the params of
+            config_snmp_user (group, authentication, pwd, encrypt,
+            privacy), or None to remove the user.  A user with a pwd is
+            always re-created since passwords can't be compared.  The
+            device only takes authentication and encrypt along with the
+            pwd, so changing them on an existing user needs a pwd.
+        hosts (dict): optional host -> dict of the params of
+            config_snmp_host (type, version, v3, community, vrf_filter,
+            vrf, udp, src_intf), or None to remove the host.  vrf_filter
+            may be a comma separated string or a list.
+
+    Anything that isn't listed is left alone.
 
-            resource[each] = []
+    Returns:
+        list: list of lists of commands, ready for execute_commands
 
-        for each in resource_table:
-            temp = {}
+    Raises:
+        ValueError: if the authentication or encrypt of an existing user
+            differs and no pwd is given, or a new host lacks its type or
+            version
+    """
+    commands = []
 
-            key = str(each['trap_type'])
+    for community, proposed in sorted((communities or {}).iteritems()):
+        existing = state.communities.get(community)
+        if proposed is None:
+            if existing:
+                commands.append(remove_snmp_community(community))
+            continue
+        delta = _delta(proposed, existing or {})
+        if delta:
+            commands.append(config_snmp_community(delta, community))
+
+    for user, proposed in sorted((users or {}).iteritems()):
+        existing = state.users.get(user)
+        if proposed is None:
+            if existing:
+                commands.append(remove_snmp_user(user))
+            continue
+        new = existing is None
+        group = proposed.get('group')
+        pwd = proposed.get('pwd')
+        if not new and not pwd:
+            for key in ('authentication', 'encrypt'):
+                value = proposed.get(key)
+                if value and value != existing[key]:
+                    raise ValueError(
+                        'snmp user {0}: changing {1} requires pwd'.format(
+                            user, key))
+        changed = new or pwd or (
+            group and group not in existing['group'])
+        if changed:
+            reset = not new and bool(proposed.get('pwd'))
+            cmds = config_snmp_user(proposed, user, reset, new)
+            if cmds:
+                commands.append(cmds)
+
+    for host, proposed in sorted((hosts or {}).iteritems()):
+        existing = state.hosts.get(host)
+        if proposed is None:
+            if existing:
+                commands.append(remove_snmp_host(host, dict(existing)))
+            continue
+        delta = _host_delta(host, proposed, existing)
+        if delta:
+            proposed = dict(proposed, snmp_host=host)
+            cmds = config_snmp_host(delta, proposed, existing or {})
+            if cmds:
+                commands.append(cmds)
 
-            temp['trap'] = str(each['description'])
-            temp['enabled'] = str(each['isEnabled'])
+    return commands
 
-            if key != 'Generic':
-                resource[key].append(temp)
 
-    except (KeyError, AttributeError):
-        return resource
+def config_snmp_state(device, state=None, communities=None, users=None,
+                      hosts=None):
+    """Brings many snmp communities, users and hosts to a desired state
+    with a single config request
 
-    find = resource.get(group, None)
+    Args:
+        device (Device): This is the device object of an NX-API enabled device
+            using the Device class
+        state (SnmpState): optional output of get_snmp_state, fetched if
+            omitted
+        communities, users, hosts (dict): see get_commands_snmp_state
 
-    if group == 'all'.lower():
-        return resource
-    elif find:
-        return find
-    else:
-        return []
+    Returns:
+        list: the commands that were sent, see get_commands_snmp_state
+    """
+    if state is None:
+        state = get_snmp_state(device)
+    commands = get_commands_snmp_state(state, communities, users, hosts)
+    execute_commands(device, commands)
+    return commands
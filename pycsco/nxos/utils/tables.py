@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Jason Edelman <jedelman8@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Declarative extraction of TABLE_x/ROW_x data from NX-API bodies.
+
+NX-API returns a dict for a table with one row and a list for a table
+with several rows.  A Table describes where the rows live and how each
+output key is built from a row, and takes care of both shapes.
+
+Example:
+    MODULES = Table('TABLE_modinfo', 'ROW_modinfo', [
+        ('ports', 'ports'),
+        ('type', 'modtype'),
+        ('model', 'model'),
+    ])
+    MODULES.extract(body)
+    [{'ports': '48', 'type': '48x10GE Supervisor', 'model': 'N3K-C3064PQ'}]
+
+``Table.lazy`` returns LazyRecord rows instead, which only convert a
+field when it is read.
+
+"""
+try:
+    import collections
+except ImportError as e:
+    print '*' * 30
+    print e
+    print '*' * 30
+
+__all__ = ['Table', 'LazyRecord', 'get_rows']
+
+# number of distinct raw values kept by the text cache before it is reset
+TEXT_CACHE_SIZE = 2**16
+
+
+class _TextCache(dict):
+    """raw value -> str(raw value).  NX-API rows repeat the same few
+    values ('up', 'full', '1', ...), and a dict lookup is cheaper than
+    converting unicode to str every time.  Raw values are the strings
+    (or None) xmltodict returns, so equal keys always convert equally.
+    """
+    def __missing__(self, value):
+        text = self[value] = str(value)
+        return text
+
+
+_text = _TextCache()
+
+
+def get_rows(body, table, row):
+    """Rows of a table in an NX-API body, always as a list
+
+    Args:
+        body (dict): body of a command's output
+        table (str or tuple): key of the table, or the keys leading to it
+            e.g. ('powersup', 'TABLE_psinfo')
+        row (str): key of the rows within the table
+
+    Returns:
+        list: row dicts, [] if the table isn't there.  The rows of a
+        table that is repeated are returned together.
+
+    """
+    if isinstance(table, basestring):
+        table = (table,)
+    node = body
+    for key in table:
+        if not isinstance(node, dict):
+            return []
+        node = node.get(key)
+    if isinstance(node, list):
+        # the same table repeated, e.g. one TABLE_vrf per vrf
+        rows = []
+        for each in node:
+            rows.extend(get_rows(each, (), row))
+        return rows
+    if not isinstance(node, dict):
+        return []
+    rows = node.get(row)
+    if rows is None:
+        return []
+    if isinstance(rows, dict):
+        return [rows]
+    return rows
+
+
+class LazyRecord(object):
+    """Read-only mapping over one raw NX-API row.  A field is converted
+    the first time it is read, by key or as an attribute, and kept in
+    a slot.  Subclasses are generated per Table.
+    """
+    __slots__ = ('_row',)
+
+    # output key -> (slot, NX-API key, converter), set by Table
+    _fields = {}
+
+    def __init__(self, row):
+        self._row = row
+
+    def _value(self, slot, nx_key, converter):
+        # a slot that was never assigned raises AttributeError
+        try:
+            return object.__getattribute__(self, slot)
+        except AttributeError:
+            value = converter(self._row.get(nx_key))
+            setattr(self, slot, value)
+            return value
+
+    def __getattr__(self, name):
+        # output keys aren't real attributes, so this runs on every read
+        try:
+            field = self._fields[name]
+        except KeyError:
+            raise AttributeError(name)
+        return self._value(*field)
+
+    def __getitem__(self, key):
+        try:
+            field = self._fields[key]
+        except (KeyError, TypeError):
+            raise KeyError(key)
+        return self._value(*field)
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            return self[key]
+        return default
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return list(self._fields)
+
+    def values(self):
+        return [self[key] for key in self._fields]
+
+    def items(self):
+        return [(key, self[key]) for key in self._fields]
+
+    def iteritems(self):
+        return ((key, self[key]) for key in self._fields)
+
+    def to_dict(self):
+        return dict(self.iteritems())
+
+    def __eq__(self, other):
+        if isinstance(other, (dict, LazyRecord)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, self.to_dict())
+
+
+collections.Mapping.register(LazyRecord)
+
+
+class Table(object):
+    """Schema of one NX-API table.
+
+    Args:
+        table (str or tuple): see get_rows
+        row (str): see get_rows
+        fields (list): (output key, NX-API key) or (output key, NX-API key,
+            converter) tuples.  The converter gets the raw value, None if
+            the row doesn't have the key, and defaults to ``str`` so
+            missing values come out as 'None' like the hand written
+            getters always did.
+    """
+    def __init__(self, table, row, fields):
+        self.table = table
+        self.row = row
+        self.fields = [(field + (str,))[:3] for field in fields]
+        self._fast = self._converter()
+        self.record = self._record_class()
+
+    def _converter(self):
+        # one function per schema that builds a row's dict as a literal.
+        # ``str`` fields go through the shared _text cache, other
+        # converters are called as given.
+        namespace = {'text': _text.__getitem__}
+        items = []
+        for index, (key, nx_key, converter) in enumerate(self.fields):
+            if converter is str:
+                call = 'text'
+            else:
+                call = 'c{0}'.format(index)
+                namespace[call] = converter
+            items.append('{0!r}: {1}(get({2!r}))'.format(key, call, nx_key))
+        # converters are default arguments so they are fast locals
+        source = 'def convert(row, {0}):\n    get = row.get\n' \
+            '    return {{{1}}}\n'.format(
+                ', '.join('{0}={0}'.format(name) for name in namespace),
+                ', '.join(items))
+        exec compile(source, '<Table {0}>'.format(self.row), 'exec') \
+            in namespace
+        return namespace['convert']
+
+    def convert(self, row):
+        """One raw row dict converted to the schema's output keys
+        """
+        try:
+            return self._fast(row)
+        except TypeError:
+            # a nested table is unhashable, so it can't go through _text
+            return dict((key, converter(row.get(nx_key)))
+                        for key, nx_key, converter in self.fields)
+
+    def _record_class(self):
+        name = str(self.row if isinstance(self.row, str) else 'Row')
+        slots = tuple('_f{0}'.format(i) for i in range(len(self.fields)))
+        # keep the schema's key order for iteration
+        lookup = collections.OrderedDict(
+            (key, (slot, nx_key, converter))
+            for slot, (key, nx_key, converter) in zip(slots, self.fields))
+        return type(name, (LazyRecord,), {'__slots__': slots,
+                                          '_fields': lookup})
+
+    def rows(self, body):
+        """Raw row dicts of the table in ``body``
+        """
+        return get_rows(body, self.table, self.row)
+
+    def extract(self, body):
+        """Converted rows of the table in ``body``
+
+        Returns:
+            list: one dict per row with the schema's output keys
+        """
+        rows = get_rows(body, self.table, self.row)
+        if len(_text) > TEXT_CACHE_SIZE:
+            _text.clear()
+        try:
+            return map(self._fast, rows)
+        except TypeError:
+            return map(self.convert, rows)
+
+    def lazy(self, body):
+        """Rows of the table in ``body`` as LazyRecord objects
+
+        Returns:
+            list: one LazyRecord per row with the schema's output keys
+        """
+        return map(self.record, get_rows(body, self.table, self.row))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Jason Edelman <jedelman8@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Builds a physical topology from the CDP or LLDP neighbors of a group
+of devices.
+"""
+try:
+    import hashlib
+    from pycsco.nxos.utils import parallel
+    from pycsco.nxos.utils.nxapi_lib import get_command_bodies, \
+        NEIGHBOR_COMMANDS, _neighbors_from_body, _normalize_interface
+except ImportError as e:
+    print '*' * 30
+    print e
+    print '*' * 30
+
+__all__ = ['Topology']
+
+
+def _short_name(name):
+    return str(name).split('.')[0].split('(')[0]
+
+
+def _interface(name):
+    # LLDP reports the local port short (Eth1/1) and the peer's long
+    # (Ethernet1/1), both ends of a link must give the same key
+    return _normalize_interface(str(name))
+
+
+class Topology(object):
+    """Adjacency index of a group of devices.
+
+    Each link is indexed from both ends by (hostname, interface) and
+    stored once no matter how many ends reported it.  Interfaces are
+    lower case with ethernet and port-channel spelled out.  ``refresh`` polls
+    the devices concurrently and only re-indexes the ones whose neighbor
+    table changed.
+
+    Args:
+        neigh_type (str): OPTIONAL - cdp or lldp
+        workers (int): OPTIONAL - number of devices polled at once
+    """
+    def __init__(self, neigh_type='cdp', workers=parallel.DEFAULT_WORKERS):
+        self.neigh_type = neigh_type
+        self.workers = workers
+        # device ip -> (hostname, digest of its neighbor table)
+        self.devices = {}
+        # (hostname, interface) -> neighbor dict as returned by get_neighbors
+        self.adjacency = {}
+        # hostname -> local interfaces it reported neighbors on
+        self.ports = {}
+        # sorted pair of (hostname, interface) ends -> hostnames reporting it
+        self.link_index = {}
+        self.errors = {}
+
+    def _poll(self, device):
+        bodies = get_command_bodies(
+            device, ['show hostname', NEIGHBOR_COMMANDS[self.neigh_type]])
+        hostname = _short_name(bodies[0]['hostname'])
+        if bodies[1]:
+            neighbors = _neighbors_from_body(bodies[1], self.neigh_type)
+        else:
+            neighbors = []
+        return hostname, neighbors
+
+    @staticmethod
+    def _digest(neighbors):
+        rows = sorted(tuple(sorted(each.items())) for each in neighbors)
+        return hashlib.sha1(repr(rows)).hexdigest()
+
+    def _remove(self, hostname):
+        for interface in self.ports.pop(hostname, ()):
+            neighbor = self.adjacency.pop((hostname, interface))
+            link = self._link_key(hostname, interface, neighbor)
+            reporters = self.link_index.get(link)
+            if reporters is not None:
+                reporters.discard(hostname)
+                if not reporters:
+                    del self.link_index[link]
+
+    @staticmethod
+    def _link_key(hostname, interface, neighbor):
+        return tuple(sorted([
+            (hostname, interface),
+            (_short_name(neighbor['neighbor']),
+             _interface(neighbor['neighbor_interface']))]))
+
+    def _add(self, hostname, neighbors):
+        ports = self.ports.setdefault(hostname, set())
+        for each in neighbors:
+            interface = _interface(each['local_interface'])
+            ports.add(interface)
+            self.adjacency[(hostname, interface)] = each
+            link = self._link_key(hostname, interface, each)
+            self.link_index.setdefault(link, set()).add(hostname)
+
+    def refresh(self, devices):
+        """Poll the devices and update the index.
+
+        Args:
+            devices (list): Device objects of NX-API enabled devices
+
+        Returns:
+            list: hostnames of the devices whose neighbors changed.
+            Devices that couldn't be polled are left as they were and
+            recorded in ``errors`` keyed by ip.
+        """
+        changed = []
+        for device, result, error in parallel.iter_results(
+                self._poll, devices, self.workers):
+            if error is not None:
+                self.errors[device.ip] = error
+                continue
+            self.errors.pop(device.ip, None)
+
+            hostname, neighbors = result
+            digest = self._digest(neighbors)
+            previous = self.devices.get(device.ip)
+            if previous == (hostname, digest):
+                continue
+
+            if previous is not None:
+                self._remove(previous[0])
+            self._remove(hostname)
+            self._add(hostname, neighbors)
+            self.devices[device.ip] = (hostname, digest)
+            changed.append(hostname)
+
+        return changed
+
+    def forget(self, device):
+        """Drop a device and the links only it reported.
+        """
+        previous = self.devices.pop(device.ip, None)
+        if previous is not None:
+            self._remove(previous[0])
+
+    def neighbors(self, hostname, interface=None):
+        """Neighbors seen by a device.
+
+        Args:
+            hostname (str): device as named by its hostname
+            interface (str): OPTIONAL - only this local interface
+
+        Returns:
+            dict: local interface -> neighbor dict, or the neighbor
+            dict of ``interface`` (None if there is none)
+        """
+        if interface is not None:
+            return self.adjacency.get((hostname, _interface(interface)))
+        return dict((intf, self.adjacency[(hostname, intf)])
+                    for intf in self.ports.get(hostname, ()))
+
+    def links(self):
+        """Returns:
+            list: ((hostname, interface), (hostname, interface)) tuples,
+            one per link however many ends reported it
+        """
+        return sorted(self.link_index)
+
+    def graph(self):
+        """Returns:
+            dict: hostname -> set of neighbor hostnames
+        """
+        graph = {}
+        for (a, _), (b, _) in self.link_index:
+            graph.setdefault(a, set()).add(b)
+            graph.setdefault(b, set()).add(a)
+        return graph